@@ -1,14 +1,94 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import os
 from pathlib import Path
 import firebase_admin
 from firebase_admin import credentials, firestore, auth
 import re
-from datetime import datetime
+import base64
+import binascii
+import json
+import hashlib
+import bisect
+import heapq
+import queue
+import random
+import socket
+import threading
+import time
+import contextvars
+import functools
+from collections import OrderedDict, deque
+from operator import attrgetter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - the stdlib encoder is used instead
+    orjson = None
+
+import archive
+import availability
+import compression
+import idempotency
+import metrics
+import ratelimit
+import review_snapshot
+import schemas
+import search
+import storage
+import tracing
+
+
+class AppJSONProvider(DefaultJSONProvider):
+    """Encodes with orjson when it is installed, otherwise with the stdlib.
+
+    Datetimes are passed through to `default` so both encoders format them
+    the way Flask always has.
+    """
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, schemas.Row):
+            return o.to_dict()
+        return DefaultJSONProvider.default(o)
+
+    def dumps_bytes(self, obj):
+        with tracing.span("serialize"):
+            if orjson is None:
+                return json.dumps(
+                    obj, default=self.default, ensure_ascii=self.ensure_ascii, sort_keys=self.sort_keys
+                ).encode("utf-8")
+            option = orjson.OPT_PASSTHROUGH_DATETIME
+            if self.sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            return orjson.dumps(obj, default=self.default, option=option)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            with tracing.span("serialize"):
+                return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode("utf-8")
+
+    def response(self, *args, **kwargs):
+        if self._app.debug:
+            # Keeps Flask's indented output while debugging.
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b"\n", mimetype=self.mimetype)
+
 
 app = Flask(__name__)
+app.json = AppJSONProvider(app)
 CORS(app)
+metrics.init_app(app)
+compression.init_app(app)
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "firestore").strip().lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH") or str(Path(__file__).with_name("local.db"))
+
 
 def init_firebase():
     """Initialize Firebase without crashing when credentials are missing/empty."""
@@ -22,15 +102,167 @@ def init_firebase():
                 firebase_admin.initialize_app(cred)
             else:
                 firebase_admin.initialize_app()
+        if STORAGE_BACKEND == "sqlite":
+            return storage.SQLiteClient(SQLITE_PATH), None
         return firestore.client(), None
     except Exception:
+        if STORAGE_BACKEND == "sqlite":
+            # Local storage does not need Firebase; only token verification does.
+            return storage.SQLiteClient(SQLITE_PATH), None
         return None, (
             "Firebase is not configured. Add a valid service account JSON at "
             "`backend/serviceAccountKey.json` or set `FIREBASE_SERVICE_ACCOUNT_PATH`."
         )
 
 
-db, firebase_init_error = init_firebase()
+class FirebaseBackend:
+    """The Firebase app and storage client of the current process.
+
+    Nothing is created at import time: gRPC channels opened in a gunicorn
+    master before it forks are not usable in the workers. Each process
+    initializes on first use (normally the post_worker_init hook in
+    gunicorn.conf.py, otherwise its first request).
+    """
+
+    def __init__(self):
+        self.client = None
+        self.error = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    if self._pid is not None:
+                        self._discard_inherited()
+                    self.client, self.error = init_firebase()
+                    self._pid = os.getpid()
+        return self.client
+
+    def _discard_inherited(self):
+        # Initialized before a fork: drop the parent's app (and its cached
+        # Firestore channel) so this process opens its own.
+        for firebase_app in list(firebase_admin._apps.values()):
+            try:
+                firebase_admin.delete_app(firebase_app)
+            except Exception:
+                app.logger.warning("Could not discard inherited Firebase app", exc_info=True)
+
+
+class LazyClient:
+    def __init__(self, backend):
+        self._backend = backend
+
+    def __getattr__(self, name):
+        return getattr(self._backend.get(), name)
+
+
+firebase_backend = FirebaseBackend()
+db = metrics.instrument_client(LazyClient(firebase_backend))
+
+WORKER_WARM_UP = os.getenv("WORKER_WARM_UP", "1").strip().lower() not in ("0", "false", "no")
+worker_pid = None
+worker_lock = threading.Lock()
+booking_watch = current_affairs_watch = current_affairs_search_watch = None
+
+
+@app.before_request
+def ensure_worker_started():
+    # Covers the dev server and hosts without the gunicorn hook; registered
+    # first so later hooks can verify tokens.
+    if worker_pid != os.getpid():
+        start_worker(warm_up=False)
+
+
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+CERT_REFRESH_INTERVAL_SECONDS = int(os.getenv("CERT_REFRESH_INTERVAL_SECONDS", "3600"))
+
+
+class TokenCache:
+    """Bounded LRU of decoded ID tokens, keyed by a SHA-256 of the raw token."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(id_token):
+        return hashlib.sha256(id_token.encode("utf-8")).hexdigest()
+
+    def get(self, id_token):
+        key = self._key(id_token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, claims = entry
+            if time.time() >= expires_at:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return claims
+
+    def put(self, id_token, claims):
+        expires_at = claims.get("exp")
+        if not isinstance(expires_at, (int, float)) or time.time() >= expires_at:
+            return
+        key = self._key(id_token)
+        with self._lock:
+            self._entries[key] = (expires_at, claims)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+token_cache = TokenCache(TOKEN_CACHE_MAX_ENTRIES)
+
+
+def refresh_signing_certs():
+    # The Admin SDK keeps Google's signing certs in an HTTP cache that honours
+    # Cache-Control, so re-requesting them here keeps that cache warm and means
+    # a verify_id_token miss never has to wait on the cert download.
+    from firebase_admin import _token_gen
+
+    verifier = auth._get_client(firebase_admin.get_app())._token_verifier
+    verifier.request(url=_token_gen.ID_TOKEN_CERT_URI, method="GET")
+
+
+def start_cert_refresher(refresh_now=True):
+    def run():
+        if not refresh_now:
+            time.sleep(CERT_REFRESH_INTERVAL_SECONDS)
+        while True:
+            try:
+                refresh_signing_certs()
+            except Exception:
+                app.logger.warning("Could not refresh Firebase token signing certs", exc_info=True)
+            time.sleep(CERT_REFRESH_INTERVAL_SECONDS)
+
+    thread = threading.Thread(target=run, name="cert-refresher", daemon=True)
+    thread.start()
+    return thread
+
+
+def firebase_project_configured():
+    return bool(firebase_admin._apps) and bool(firebase_admin.get_app().project_id)
 
 
 @app.route("/")
@@ -43,16 +275,43 @@ def verify_token(req):
     if not auth_header.startswith("Bearer "):
         return None
 
-    try:
-        id_token = auth_header.split("Bearer ", 1)[1]
-        return auth.verify_id_token(id_token)
-    except Exception:
-        return None
+    id_token = auth_header.split("Bearer ", 1)[1]
+    started = time.perf_counter()
+    with tracing.span("verify_token") as span:
+        cached = token_cache.get(id_token)
+        if cached is not None:
+            span.set(cache="hit")
+            metrics.observe_token_verification(time.perf_counter() - started, cached=True)
+            return cached
+
+        span.set(cache="miss")
+        try:
+            claims = auth.verify_id_token(id_token)
+        except Exception:
+            return None
+        finally:
+            metrics.observe_token_verification(time.perf_counter() - started, cached=False)
+    token_cache.put(id_token, claims)
+    return claims
+
+
+io_pool = ThreadPoolExecutor(max_workers=int(os.getenv("IO_POOL_WORKERS", "16")), thread_name_prefix="firestore-io")
+
+
+def run_concurrently(*calls):
+    # Overlaps independent Firestore round trips within one request. Under the
+    # gevent serving mode (see cooperative.py) these threads are greenlets.
+    # Each call runs in a copy of the caller's context so request-scoped state
+    # (flask.g, per-request metrics) is visible from the pool threads.
+    with tracing.span("run_concurrently", calls=len(calls)):
+        futures = [io_pool.submit(contextvars.copy_context().run, call) for call in calls]
+        return [future.result() for future in futures]
 
 
 def ensure_backend_ready():
-    if firebase_init_error:
-        return jsonify({"error": firebase_init_error}), 500
+    firebase_backend.get()
+    if firebase_backend.error:
+        return jsonify({"error": firebase_backend.error}), 500
     return None
 
 
@@ -61,20 +320,305 @@ def is_admin_user(user):
     return bool(user.get("admin")) or "admin" in user.get("email", "").lower()
 
 
-def has_conflict(room, date, start_time, end_time):
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_WAIT_SECONDS = int(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "30"))
+
+idempotency_store = idempotency.IdempotencyStore(db, IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_WAIT_SECONDS)
+
+
+def idempotent(view):
+    """Replays the first response to a request retried with the same Idempotency-Key."""
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(idempotency.IDEMPOTENCY_HEADER, "").strip()
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > idempotency.MAX_KEY_LENGTH:
+            message = f"{idempotency.IDEMPOTENCY_HEADER} must be at most {idempotency.MAX_KEY_LENGTH} characters."
+            return jsonify({"error": message}), 400
+
+        backend_error = ensure_backend_ready()
+        if backend_error:
+            return backend_error
+        user = verify_token(request)
+        if not user:
+            return view(*args, **kwargs)
+
+        def handler():
+            response = app.make_response(view(*args, **kwargs))
+            return idempotency.StoredResponse(response.status_code, response.get_data(), response.content_type)
+
+        scope = idempotency.request_scope(user.get("email", ""), request.method, request.path, key)
+        try:
+            stored, replayed = idempotency_store.run(scope, idempotency.request_fingerprint(request.get_data()), handler)
+        except idempotency.KeyReused:
+            return jsonify({"error": f"{idempotency.IDEMPOTENCY_HEADER} was already used for a different request."}), 422
+        except idempotency.StillRunning:
+            response = jsonify({"error": f"A request with this {idempotency.IDEMPOTENCY_HEADER} is still in progress."})
+            response.headers["Retry-After"] = "1"
+            return response, 409
+
+        response = Response(stored.body, status=stored.status, content_type=stored.content_type)
+        if replayed:
+            response.headers[idempotency.REPLAYED_HEADER] = "true"
+        return response
+
+    return wrapper
+
+
+@app.before_request
+def start_request_trace():
+    tracing.reset()
+    g.trace = None
+    if tracing.TRACE_REQUESTS:
+        g.trace = tracing.start(request.method, request.path)
+    elif request.headers.get(tracing.TRACE_HEADER) == "1":
+        # Started before the admin check so token verification shows up in the trace.
+        g.trace = tracing.start(request.method, request.path)
+        user = verify_token(request)
+        if not user or not is_admin_user(user):
+            tracing.discard()
+            g.trace = None
+
+
+@app.after_request
+def finish_request_trace(response):
+    trace = g.get("trace")
+    if trace is not None:
+        route = metrics.current_route()
+        response.call_on_close(lambda: tracing.finish(trace, route, response.status_code))
+    return response
+
+
+# Admission control is opt-in so existing deployments keep their behaviour.
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "0").strip().lower() not in ("0", "false", "no")
+RATE_LIMIT_STATE_PATH = os.getenv("RATE_LIMIT_STATE_PATH", "")
+RATE_LIMIT_BUDGETS = {
+    "default": ratelimit.Budget(
+        "default", int(os.getenv("RATE_LIMIT_PER_MINUTE", "120")), int(os.getenv("RATE_LIMIT_BURST", "60"))
+    ),
+    "scan": ratelimit.Budget(
+        "scan", int(os.getenv("RATE_LIMIT_SCAN_PER_MINUTE", "60")), int(os.getenv("RATE_LIMIT_SCAN_BURST", "30"))
+    ),
+}
+# Per worker; the whole server admits at most workers x these.
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "64"))
+MAX_CONCURRENT_SCANS = int(os.getenv("MAX_CONCURRENT_SCANS", "4"))
+
+rate_buckets = ratelimit.create_buckets(RATE_LIMIT_STATE_PATH) if RATE_LIMIT_ENABLED else None
+request_slots = ratelimit.ConcurrencyLimit(MAX_CONCURRENT_REQUESTS)
+scan_slots = ratelimit.ConcurrencyLimit(MAX_CONCURRENT_SCANS)
+
+
+def scan_endpoint(view):
+    """Marks a route that reads whole collections; it draws on the scan budget."""
+    view.rate_limit_budget = "scan"
+    return view
+
+
+def unmetered(view):
+    """Exempts a route (long-lived streams, health and metrics) from admission control."""
+    view.rate_limit_budget = None
+    return view
+
+
+def shed_request(reason, retry_after):
+    metrics.observe_shed(reason)
+    response = jsonify({"error": "Too many requests. Please retry shortly."})
+    response.headers["Retry-After"] = str(retry_after)
+    return response, 429
+
+
+@app.before_request
+def admit_request():
+    view = app.view_functions.get(request.endpoint)
+    budget_name = getattr(view, "rate_limit_budget", "default")
+    if not RATE_LIMIT_ENABLED or view is None or budget_name is None or request.method == "OPTIONS":
+        return None
+
+    slots = [request_slots, scan_slots] if budget_name == "scan" else [request_slots]
+    acquired = []
+    for limit in slots:
+        if not limit.try_acquire():
+            for held in acquired:
+                held.release()
+            return shed_request("concurrency", 1)
+        acquired.append(limit)
+    g.admission_slots = acquired
+
+    user = verify_token(request)
+    # Unauthenticated calls are answered with 401 by the handler; they are
+    # still metered, per client address.
+    key = f"user:{user.get('email', '')}" if user else f"ip:{request.remote_addr}"
+    wait = rate_buckets.take(f"{budget_name}:{key}", RATE_LIMIT_BUDGETS[budget_name])
+    if wait:
+        return shed_request("rate_limit", wait)
+    return None
+
+
+@app.teardown_request
+def release_admission(exc):
+    # Streamed responses keep their slot until the stream ends.
+    for limit in g.pop("admission_slots", ()):
+        limit.release()
+
+
+def intervals_overlap(start_time, end_time, other_start, other_end):
+    return not (end_time <= other_start or start_time >= other_end)
+
+
+class BookingIntervalIndex:
+    """Per-(room, date) sorted booking intervals mirrored from a Firestore listener.
+
+    Each day keeps its intervals sorted by start time alongside a running
+    maximum of end times, so an overlap check is a single bisect.
+    """
+
+    def __init__(self):
+        self.ready = threading.Event()
+        self.min_date = None
+        self._days = {}
+        self._bookings = {}
+        self._lock = threading.Lock()
+
+    def covers(self, date):
+        return self.ready.is_set() and self.min_date is not None and date >= self.min_date
+
+    def _rebuild_day(self, key, intervals):
+        if not intervals:
+            self._days.pop(key, None)
+            return
+        intervals.sort()
+        max_ends = []
+        running = ""
+        for _, end, _ in intervals:
+            running = max(running, end)
+            max_ends.append(running)
+        self._days[key] = ([start for start, _, _ in intervals], max_ends, intervals)
+
+    def _remove_locked(self, booking_id):
+        previous = self._bookings.pop(booking_id, None)
+        if previous is None:
+            return
+        key, _, _ = previous
+        _, _, intervals = self._days.get(key, ([], [], []))
+        self._rebuild_day(key, [item for item in intervals if item[2] != booking_id])
+
+    def upsert(self, booking_id, data):
+        key = (data.get("room", ""), data.get("date", ""))
+        start = data.get("start_time", "")
+        end = data.get("end_time", "")
+        with self._lock:
+            self._remove_locked(booking_id)
+            if not availability.blocks_slot(data):
+                return
+            _, _, intervals = self._days.get(key, ([], [], []))
+            self._rebuild_day(key, list(intervals) + [(start, end, booking_id)])
+            self._bookings[booking_id] = (key, start, end)
+
+    def remove(self, booking_id):
+        with self._lock:
+            self._remove_locked(booking_id)
+
+    def has_conflict(self, room, date, start_time, end_time):
+        with self._lock:
+            day = self._days.get((room, date))
+            if not day:
+                return False
+            starts, max_ends, _ = day
+            # Intervals [0:i] start before end_time; one of them overlaps iff the
+            # latest end among them is after start_time.
+            i = bisect.bisect_left(starts, end_time)
+            return i > 0 and max_ends[i - 1] > start_time
+
+    def on_snapshot(self, col_snapshot, changes, read_time):
+        for change in changes:
+            if change.type.name == "REMOVED":
+                self.remove(change.document.id)
+            else:
+                self.upsert(change.document.id, change.document.to_dict() or {})
+        self.ready.set()
+
+
+booking_index = BookingIntervalIndex()
+room_availability = availability.SlotIndex()
+
+
+def start_booking_listener():
+    # Bookings for past dates can never conflict with a new booking today, so
+    # the listener only mirrors today onwards; older dates fall back to a query.
+    booking_index.min_date = datetime.now().strftime("%Y-%m-%d")
+    query = db.collection("bookings").where("date", ">=", booking_index.min_date)
+
+    # The same listener feeds the availability grid and the admin event
+    # stream, so they cost no extra reads. The grid is updated first because
+    # booking_index marks the mirror ready for both.
+    def on_snapshot(col_snapshot, changes, read_time):
+        room_availability.on_snapshot(col_snapshot, changes, read_time)
+        booking_index.on_snapshot(col_snapshot, changes, read_time)
+        admin_events.on_bookings_snapshot(col_snapshot, changes, read_time)
+
+    return query.on_snapshot(on_snapshot)
+
+
+def query_has_conflict(room, date, start_time, end_time, transaction=None):
     existing = (
         db.collection("bookings")
         .where("room", "==", room)
         .where("date", "==", date)
-        .stream()
+        .stream(transaction=transaction)
     )
     for booking in existing:
         b = booking.to_dict()
-        if not (end_time <= b.get("start_time", "") or start_time >= b.get("end_time", "")):
+        if not availability.blocks_slot(b):
+            continue
+        if intervals_overlap(start_time, end_time, b.get("start_time", ""), b.get("end_time", "")):
             return True
     return False
 
 
+def has_conflict(room, date, start_time, end_time):
+    if booking_index.covers(date):
+        return booking_index.has_conflict(room, date, start_time, end_time)
+    return query_has_conflict(room, date, start_time, end_time)
+
+
+@storage.transactional
+def insert_booking_if_free(transaction, doc_ref, payload):
+    # The in-memory index can lag a concurrent writer by a snapshot, so the
+    # authoritative check runs inside the transaction that performs the insert.
+    if query_has_conflict(
+        payload["room"], payload["date"], payload["start_time"], payload["end_time"], transaction=transaction
+    ):
+        return False
+    transaction.set(doc_ref, payload)
+    return True
+
+
+@storage.transactional
+def set_booking_status(transaction, doc_ref, new_status):
+    # A rejected booking no longer holds its slot, so approving it again
+    # re-checks the room as a new booking would.
+    snapshot = doc_ref.get(transaction=transaction)
+    booking = snapshot.to_dict() or {}
+    if (
+        snapshot.exists
+        and not availability.blocks_slot(booking)
+        and availability.blocks_slot({"status": new_status})
+        and query_has_conflict(
+            booking.get("room", ""),
+            booking.get("date", ""),
+            booking.get("start_time", ""),
+            booking.get("end_time", ""),
+            transaction=transaction,
+        )
+    ):
+        return False
+    transaction.update(doc_ref, {"status": new_status})
+    return True
+
+
 def is_valid_week_format(week):
     if not isinstance(week, str):
         return False
@@ -92,59 +636,727 @@ def parse_datetime_parts(date_value, time_value):
         return None
 
 
-def get_safety_alert_message(booking_data):
+BOOKING_ALERT_MESSAGE = "Student has not marked arrival after expected time."
+COMMUTE_ALERT_MESSAGE = "Student has not reached institute by expected commute ETA."
+# One worker at a time schedules and writes overdue alerts; the others stream
+# them from their listener on `alerts`.
+OVERDUE_LEASE_DOCUMENT = "overdue_alerts"
+OVERDUE_LEASE_SECONDS = 90
+OVERDUE_LEASE_RENEW_SECONDS = 30
+
+
+def booking_alert_deadline(booking_data):
     if (booking_data.get("status") or "").lower() == "rejected":
-        return ""
+        return None
     if bool(booking_data.get("has_arrived")):
-        return ""
+        return None
 
     date_value = booking_data.get("date", "")
     expected_arrival_time = booking_data.get("expected_arrival_time", "")
     if not date_value or not expected_arrival_time:
-        return ""
-
-    expected_dt = parse_datetime_parts(date_value, expected_arrival_time)
-    if not expected_dt:
-        return ""
-
-    if datetime.now() <= expected_dt:
-        return ""
-
-    return "Student has not marked arrival after expected time."
+        return None
+    return parse_datetime_parts(date_value, expected_arrival_time)
 
 
-def get_commute_alert_message(commute_data):
+def commute_alert_deadline(commute_data):
     if bool(commute_data.get("has_arrived")):
-        return ""
+        return None
 
     commute_date = commute_data.get("date", "")
     expected_arrival_time = commute_data.get("expected_arrival_time", "")
     if not commute_date or not expected_arrival_time:
-        return ""
+        return None
+    return parse_datetime_parts(commute_date, expected_arrival_time)
 
-    expected_dt = parse_datetime_parts(commute_date, expected_arrival_time)
-    if not expected_dt:
-        return ""
 
-    if datetime.now() <= expected_dt:
-        return ""
+def booking_alert_record(booking_id, data):
+    return {
+        "kind": "booking",
+        "ref_id": booking_id,
+        "user": data.get("user", ""),
+        "room": data.get("room", ""),
+        "date": data.get("date", ""),
+        "expected_arrival_time": data.get("expected_arrival_time", ""),
+        "message": BOOKING_ALERT_MESSAGE,
+    }
 
-    return "Student has not reached institute by expected commute ETA."
 
+def commute_alert_record(entry_id, data):
+    return {
+        "kind": "commute",
+        "ref_id": entry_id,
+        "user": data.get("user", ""),
+        "date": data.get("date", ""),
+        "expected_arrival_time": data.get("expected_arrival_time", ""),
+        "travel_mode": data.get("travel_mode", ""),
+        "notes": data.get("notes", ""),
+        "message": COMMUTE_ALERT_MESSAGE,
+    }
 
-def serialize_current_affair(doc):
+
+class OverdueAlertScheduler:
+    """Min-heap of expected-arrival deadlines that writes each alert to `alerts` once.
+
+    Entries are scheduled and cancelled from Firestore listeners on the
+    not-yet-arrived bookings and commute entries; cancellation is lazy, so a
+    heap item only fires if it still matches the pending deadline for its id.
+    Only the worker holding the overdue-alert lease runs those listeners.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._pending = {}
+        self._fired = {}
+        self._known = set()
+        self._cond = threading.Condition()
+
+    def seed_fired(self, alerts):
+        with self._cond:
+            for alert_id, alert in alerts:
+                self._fired[alert_id] = parse_datetime_parts(alert.get("date", ""), alert.get("expected_arrival_time", ""))
+
+    def schedule(self, alert_id, deadline, record):
+        with self._cond:
+            self._known.add(alert_id)
+            if alert_id in self._fired:
+                if self._fired[alert_id] == deadline:
+                    return
+                # The expected arrival moved after the alert fired; withdraw it
+                # and let the new deadline fire on its own.
+                del self._fired[alert_id]
+                stale = True
+            else:
+                stale = False
+            self._pending[alert_id] = (deadline, record)
+            heapq.heappush(self._heap, (deadline, alert_id))
+            self._cond.notify()
+        if stale:
+            self._withdraw(alert_id)
+
+    def reset(self):
+        with self._cond:
+            self._heap = []
+            self._pending = {}
+            self._fired = {}
+            self._known = set()
+
+    def _withdraw(self, alert_id):
+        db.collection("alerts").document(alert_id).delete()
+
+    def discard(self, alert_id):
+        """Drop local state for an alert; returns True if it had already fired."""
+        with self._cond:
+            self._pending.pop(alert_id, None)
+            self._known.discard(alert_id)
+            return self._fired.pop(alert_id, False) is not False
+
+    def cancel(self, alert_id, resolve=False):
+        if self.discard(alert_id) or resolve:
+            self._withdraw(alert_id)
+
+    def reconcile(self):
+        # Alerts written before this process started whose booking/entry has
+        # since arrived (or disappeared) are no longer backed by a listener row.
+        with self._cond:
+            stale = [alert_id for alert_id in self._fired if alert_id not in self._known]
+            for alert_id in stale:
+                del self._fired[alert_id]
+        for alert_id in stale:
+            self._withdraw(alert_id)
+
+    def _next_due(self):
+        with self._cond:
+            while True:
+                while self._heap:
+                    deadline, alert_id = self._heap[0]
+                    pending = self._pending.get(alert_id)
+                    if pending and pending[0] == deadline:
+                        break
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                delay = (self._heap[0][0] - datetime.now()).total_seconds()
+                if delay <= 0:
+                    deadline, alert_id = heapq.heappop(self._heap)
+                    _, record = self._pending.pop(alert_id)
+                    self._fired[alert_id] = deadline
+                    return alert_id, record
+                self._cond.wait(timeout=delay)
+
+    def run(self):
+        while True:
+            alert_id, record = self._next_due()
+            try:
+                db.collection("alerts").document(alert_id).set({**record, "fired_at": firestore.SERVER_TIMESTAMP})
+            except Exception:
+                app.logger.warning("Could not record overdue alert %s", alert_id, exc_info=True)
+                with self._cond:
+                    self._fired.pop(alert_id, None)
+
+    def watch(self, collection, deadline_fn, record_fn, prefix, loaded):
+        def on_snapshot(col_snapshot, changes, read_time):
+            for change in changes:
+                alert_id = f"{prefix}_{change.document.id}"
+                data = change.document.to_dict() or {}
+                deadline = None if change.type.name == "REMOVED" else deadline_fn(data)
+                if deadline is None:
+                    self.cancel(alert_id)
+                else:
+                    self.schedule(alert_id, deadline, record_fn(change.document.id, data))
+            loaded.set()
+
+        return db.collection(collection).where("has_arrived", "==", False).on_snapshot(on_snapshot)
+
+
+overdue_scheduler = OverdueAlertScheduler()
+
+
+def watch_overdue_deadlines():
+    overdue_scheduler.seed_fired((doc.id, doc.to_dict() or {}) for doc in db.collection("alerts").stream())
+    bookings_loaded = threading.Event()
+    commutes_loaded = threading.Event()
+    watches = [
+        overdue_scheduler.watch("bookings", booking_alert_deadline, booking_alert_record, "booking", bookings_loaded),
+        overdue_scheduler.watch("commute_eta", commute_alert_deadline, commute_alert_record, "commute", commutes_loaded),
+    ]
+
+    def reconcile_when_loaded():
+        if bookings_loaded.wait(timeout=300) and commutes_loaded.wait(timeout=300):
+            overdue_scheduler.reconcile()
+
+    threading.Thread(target=reconcile_when_loaded, name="overdue-alerts-reconcile", daemon=True).start()
+    return watches
+
+
+def start_overdue_scheduler():
+    """Schedules overdue alerts in whichever worker holds the overdue-alert lease.
+
+    The lease is renewed well before it expires; a worker that cannot renew it
+    stops its listeners once it lapses, and another worker takes over.
+    """
+    holder = f"{socket.gethostname()}:{os.getpid()}"
+    lease = db.collection(archive.LEASE_COLLECTION).document(OVERDUE_LEASE_DOCUMENT)
+    threading.Thread(target=overdue_scheduler.run, name="overdue-alerts", daemon=True).start()
+
+    def run():
+        watches = None
+        expires = 0
+        while True:
+            try:
+                leading = archive.claim_lease(db.transaction(), lease, holder, OVERDUE_LEASE_SECONDS)
+                if leading:
+                    expires = time.monotonic() + OVERDUE_LEASE_SECONDS
+            except Exception:
+                app.logger.warning("Could not renew the overdue-alert lease", exc_info=True)
+                leading = time.monotonic() < expires
+            try:
+                if leading and watches is None:
+                    watches = watch_overdue_deadlines()
+                elif not leading and watches is not None:
+                    for watch in watches:
+                        watch.unsubscribe()
+                    watches = None
+                    overdue_scheduler.reset()
+            except Exception:
+                app.logger.warning("Could not switch the overdue-alert listeners", exc_info=True)
+            time.sleep(OVERDUE_LEASE_RENEW_SECONDS)
+
+    thread = threading.Thread(target=run, name="overdue-alerts-lease", daemon=True)
+    thread.start()
+    return thread
+
+
+def load_active_alerts(kind, user_email=None):
+    query = db.collection("alerts").where("kind", "==", kind)
+    if user_email is not None:
+        query = query.where("user", "==", user_email)
+    return {data.get("ref_id", ""): data for data in (doc.to_dict() or {} for doc in query.stream())}
+
+
+FOOD_REVIEW_SAMPLE_COMMENTS = 3
+
+
+def food_review_aggregate_ref(week, hostel):
+    # Document IDs cannot contain "/", which hostel names occasionally do.
+    return db.collection("food_review_aggregates").document(f"{week}_{hostel.replace('/', '-')}")
+
+
+def empty_food_review_aggregate(week, hostel):
+    return {
+        "week": week,
+        "hostel": hostel,
+        "review_count": 0,
+        "taste_total": 0,
+        "hygiene_total": 0,
+        "variety_total": 0,
+        "overall_total": 0,
+        "comment_count": 0,
+        "sample_comments": [],
+    }
+
+
+def apply_review_to_aggregate(aggregate, review, sign):
+    aggregate["review_count"] += sign
+    aggregate["taste_total"] += sign * int(review.get("taste_rating", 0) or 0)
+    aggregate["hygiene_total"] += sign * int(review.get("hygiene_rating", 0) or 0)
+    aggregate["variety_total"] += sign * int(review.get("variety_rating", 0) or 0)
+    aggregate["overall_total"] += sign * float(review.get("overall_rating", 0) or 0)
+
+    user_email = review.get("user", "")
+    comment = (review.get("comment", "") or "").strip()
+    samples = aggregate["sample_comments"]
+    if sign < 0:
+        if comment:
+            aggregate["comment_count"] -= 1
+        aggregate["sample_comments"] = [item for item in samples if item.get("user") != user_email]
+        return
+    if not comment:
+        return
+
+    # Reservoir sampling keeps a uniform sample of comments without storing them all.
+    aggregate["comment_count"] += 1
+    entry = {"user": user_email, "comment": comment}
+    if len(samples) < FOOD_REVIEW_SAMPLE_COMMENTS:
+        samples.append(entry)
+        return
+    slot = random.randrange(aggregate["comment_count"])
+    if slot < FOOD_REVIEW_SAMPLE_COMMENTS:
+        samples[slot] = entry
+
+
+def stable_document_id(*parts):
+    # Natural keys contain free text (hostel names, emails) that may include
+    # "/", so they are hashed rather than joined into the document id.
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()[:40]
+
+
+def food_review_id(week, hostel, user_email):
+    return stable_document_id("food_review", week, hostel, user_email)
+
+
+def read_documents(references, transaction=None):
+    """Fetches several documents in one round trip, keyed by reference path."""
+    return {snapshot.reference.path: snapshot for snapshot in db.get_all(references, transaction=transaction)}
+
+
+@storage.transactional
+def upsert_food_review(transaction, payload):
+    reviews = db.collection("food_reviews")
+    review_ref = reviews.document(food_review_id(payload["week"], payload["hostel"], payload["user"]))
+    aggregate_ref = food_review_aggregate_ref(payload["week"], payload["hostel"])
+    snapshots = read_documents([review_ref, aggregate_ref], transaction=transaction)
+    review_snapshot = snapshots[review_ref.path]
+    aggregate_snapshot = snapshots[aggregate_ref.path]
+
+    aggregate = empty_food_review_aggregate(payload["week"], payload["hostel"])
+    if aggregate_snapshot.exists:
+        aggregate.update(aggregate_snapshot.to_dict() or {})
+        if review_snapshot.exists:
+            apply_review_to_aggregate(aggregate, review_snapshot.to_dict() or {}, -1)
+    else:
+        # First submit for this hostel/week since aggregates were introduced:
+        # seed from the reviews already stored, minus the one being replaced.
+        seed = (
+            reviews.where("week", "==", payload["week"])
+            .where("hostel", "==", payload["hostel"])
+            .stream(transaction=transaction)
+        )
+        for doc in seed:
+            if doc.id != review_ref.id:
+                apply_review_to_aggregate(aggregate, doc.to_dict() or {}, 1)
+    apply_review_to_aggregate(aggregate, payload, 1)
+    aggregate["updated_at"] = firestore.SERVER_TIMESTAMP
+    transaction.set(aggregate_ref, aggregate)
+
+    if review_snapshot.exists:
+        transaction.update(review_ref, payload)
+        return review_ref.id, False
+
+    transaction.set(review_ref, {**payload, "created_at": firestore.SERVER_TIMESTAMP})
+    return review_ref.id, True
+
+
+def food_review_week_ref(week):
+    return db.collection("food_review_aggregate_weeks").document(week)
+
+
+@storage.transactional
+def rebuild_food_review_week(transaction, week):
+    reviews = db.collection("food_reviews").where("week", "==", week).stream(transaction=transaction)
+    aggregates = {}
+    for doc in reviews:
+        data = doc.to_dict() or {}
+        hostel = data.get("hostel", "Unknown Hostel")
+        if hostel not in aggregates:
+            aggregates[hostel] = empty_food_review_aggregate(week, hostel)
+        apply_review_to_aggregate(aggregates[hostel], data, 1)
+
+    existing = db.collection("food_review_aggregates").where("week", "==", week).stream(transaction=transaction)
+    for doc in existing:
+        hostel = (doc.to_dict() or {}).get("hostel", "Unknown Hostel")
+        aggregates.setdefault(hostel, empty_food_review_aggregate(week, hostel))
+    # Reading every aggregate we overwrite makes a concurrent
+    # upsert_food_review conflict with this rebuild instead of being lost.
+    read_documents([food_review_aggregate_ref(week, hostel) for hostel in aggregates], transaction=transaction)
+
+    for hostel, aggregate in aggregates.items():
+        transaction.set(
+            food_review_aggregate_ref(week, hostel), {**aggregate, "updated_at": firestore.SERVER_TIMESTAMP}
+        )
+    transaction.set(food_review_week_ref(week), {"week": week, "rebuilt_at": firestore.SERVER_TIMESTAMP})
+    return [aggregate for aggregate in aggregates.values() if aggregate["review_count"] > 0]
+
+
+def rebuild_food_review_aggregates(week):
+    aggregates = rebuild_food_review_week(db.transaction(), week)
+    food_review_weeks_aggregated.add(week)
+    return aggregates
+
+
+# Weeks whose aggregates are known to cover every hostel's reviews.
+food_review_weeks_aggregated = set()
+
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def encode_page_cursor(values):
+    raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_page_cursor(token, field_count=None):
+    """The list of strings a cursor encodes, or None if it is malformed."""
+    padded = token + "=" * (-len(token) % 4)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (binascii.Error, UnicodeError, ValueError):
+        return None
+    if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+        return None
+    if field_count is not None and len(values) != field_count:
+        return None
+    return values
+
+
+def parse_page_args(req, cursor_fields=None):
+    """Return (limit, cursor, error_response); limit is None when paging was not requested.
+
+    cursor_fields is the number of values a cursor for this listing holds.
+    """
+    raw_limit = (req.args.get("limit") or "").strip()
+    raw_cursor = (req.args.get("cursor") or "").strip()
+    if not raw_limit and not raw_cursor:
+        return None, None, None
+
+    limit = DEFAULT_PAGE_SIZE
+    if raw_limit:
+        try:
+            limit = int(raw_limit)
+        except ValueError:
+            return None, None, (jsonify({"error": "limit must be a number."}), 400)
+        if limit < 1 or limit > MAX_PAGE_SIZE:
+            return None, None, (jsonify({"error": f"limit must be between 1 and {MAX_PAGE_SIZE}."}), 400)
+
+    cursor = None
+    if raw_cursor:
+        cursor = decode_page_cursor(raw_cursor, cursor_fields)
+        if cursor is None:
+            return None, None, (jsonify({"error": "Invalid cursor."}), 400)
+    return limit, cursor, None
+
+
+def page_sort_key(doc, order_fields):
     data = doc.to_dict() or {}
+    return tuple(str(data.get(field, "")) for field in order_fields) + (doc.id,)
+
+
+def fetch_page(queries, order_fields, limit, cursor, direction=storage.ASCENDING):
+    # Document id is the final sort key so rows sharing the same date/time
+    # still have a stable position for start_after.
+    keys = list(order_fields) + ["__name__"]
+    docs = []
+    for query in queries:
+        for field in keys:
+            query = query.order_by(field, direction=direction)
+        if cursor:
+            query = query.start_after(dict(zip(keys, cursor)))
+        docs.extend(query.limit(limit + 1).stream())
+    if len(queries) > 1:
+        # Each archive partition returns its own first page; the merged page is
+        # the first limit rows across all of them.
+        docs.sort(key=lambda doc: page_sort_key(doc, order_fields), reverse=direction == storage.DESCENDING)
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        last = docs[-1].to_dict() or {}
+        next_cursor = encode_page_cursor([str(last.get(field, "")) for field in order_fields] + [docs[-1].id])
+    return docs, next_cursor
+
+
+def stream_merged(queries, order_fields, direction=storage.ASCENDING):
+    """Streams several identically ordered queries as one ordered stream."""
+    ordered = []
+    for query in queries:
+        for field in order_fields:
+            query = query.order_by(field, direction=direction)
+        ordered.append(query.stream())
+    if len(ordered) == 1:
+        return ordered[0]
+    return heapq.merge(
+        *ordered,
+        key=lambda doc: page_sort_key(doc, order_fields)[:-1],
+        reverse=direction == storage.DESCENDING,
+    )
+
+
+def listing_loader(queries, order_fields, limit, cursor, streaming, direction=storage.ASCENDING):
+    """Returns a callable producing (docs, next_cursor) for a live-plus-archive listing."""
+    if limit is not None:
+        return lambda: fetch_page(queries, order_fields, limit, cursor, direction=direction)
+    if streaming:
+        # A streamed listing is consumed lazily by the response generator.
+        return lambda: (stream_merged(queries, order_fields, direction), None)
+    return lambda: ([doc for query in queries for doc in query.stream()], None)
+
+
+ARCHIVE_HORIZON_DAYS = int(os.getenv("ARCHIVE_HORIZON_DAYS", "180"))
+ARCHIVE_INTERVAL_SECONDS = int(os.getenv("ARCHIVE_INTERVAL_SECONDS", "21600"))
+ARCHIVE_LEASE_SECONDS = 3600
+
+
+def archive_cutoff():
+    return (datetime.now() - timedelta(days=ARCHIVE_HORIZON_DAYS)).strftime("%Y-%m-%d")
+
+
+def wants_archived(req):
+    return (req.args.get("include_archived") or "").strip().lower() == "true"
+
+
+def archive_partitions(collection, date_from="", date_to=""):
+    """References to the archive partitions that can hold rows in the date range."""
+    if date_from and ARCHIVE_HORIZON_DAYS > 0 and date_from >= archive_cutoff():
+        return []
+    months = archive.months_in_range(archive.archived_months(db, collection), date_from, date_to)
+    return [db.collection(archive.partition_name(collection, month)) for month in months]
+
+
+def parse_date_range(req):
+    """Return (date_from, date_to, error_response) from the date_from/date_to query args."""
+    date_from = (req.args.get("date_from") or "").strip()
+    date_to = (req.args.get("date_to") or "").strip()
+    for label, value in (("date_from", date_from), ("date_to", date_to)):
+        if value:
+            try:
+                datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                return None, None, (jsonify({"error": f"Invalid {label}. Use YYYY-MM-DD."}), 400)
+    if date_from and date_to and date_from > date_to:
+        return None, None, (jsonify({"error": "date_from must not be after date_to."}), 400)
+    return date_from, date_to, None
+
+
+def apply_date_range(query, date_from, date_to):
+    if date_from:
+        query = query.where("date", ">=", date_from)
+    if date_to:
+        query = query.where("date", "<=", date_to)
+    return query
+
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+def wants_ndjson(req):
+    return req.accept_mimetypes.best_match(["application/json", NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+def encode_ndjson_line(record):
+    if orjson is not None:
+        return orjson.dumps(record, default=schemas.json_default, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(record, separators=(",", ":"), default=schemas.json_default) + "\n").encode("utf-8")
+
+
+def ndjson_response(records):
+    # Rows are encoded and flushed one at a time, so worker memory is bounded by
+    # a single document rather than the whole listing.
+    def generate():
+        for record in records:
+            started = time.perf_counter()
+            line = encode_ndjson_line(record)
+            tracing.add_timing("ndjson_serialize", time.perf_counter() - started)
+            yield line
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+
+def serialize_safety_alert(alert):
+    return {
+        "booking_id": alert.get("ref_id", ""),
+        "user": alert.get("user", ""),
+        "room": alert.get("room", ""),
+        "date": alert.get("date", ""),
+        "expected_arrival_time": alert.get("expected_arrival_time", ""),
+        "message": alert.get("message", ""),
+    }
+
+
+def serialize_commute_alert(alert):
     return {
-        "id": doc.id,
-        "title": data.get("title", ""),
-        "content": data.get("content", ""),
-        "category": data.get("category", ""),
-        "event_date": data.get("event_date", ""),
-        "created_by": data.get("created_by", ""),
+        "id": alert.get("ref_id", ""),
+        "user": alert.get("user", ""),
+        "date": alert.get("date", ""),
+        "expected_arrival_time": alert.get("expected_arrival_time", ""),
+        "travel_mode": alert.get("travel_mode", ""),
+        "notes": alert.get("notes", ""),
+        "has_arrived": False,
+        "alert_message": alert.get("message", ""),
+        "is_alert": True,
     }
 
 
+# Listing views: each query selects only its view's fields (see schemas.py).
+BOOKING_VIEW = schemas.View(
+    "BookingRow",
+    schemas.DocumentId("id"),
+    schemas.Value("room"),
+    schemas.Value("date"),
+    schemas.Value("start_time"),
+    schemas.Value("end_time"),
+    schemas.Value("expected_arrival_time"),
+    schemas.Value("purpose"),
+    schemas.Value("status", default="Pending"),
+    schemas.Flag("has_arrived"),
+    schemas.Extra("safety_alert_message"),
+)
+ADMIN_BOOKING_VIEW = schemas.View(
+    "AdminBookingRow",
+    schemas.DocumentId("id"),
+    schemas.Value("room"),
+    schemas.Value("date"),
+    schemas.Value("start_time"),
+    schemas.Value("end_time"),
+    schemas.Value("expected_arrival_time"),
+    schemas.Value("purpose"),
+    schemas.Value("user"),
+    schemas.Value("status", default="Pending"),
+    schemas.Flag("has_arrived"),
+    schemas.Extra("safety_alert"),
+    schemas.Extra("safety_alert_message"),
+)
+COMMUTE_ENTRY_VIEW = schemas.View(
+    "CommuteEntryRow",
+    schemas.DocumentId("id"),
+    schemas.Value("date"),
+    schemas.Value("expected_arrival_time"),
+    schemas.Value("travel_mode"),
+    schemas.Value("notes"),
+    schemas.Flag("has_arrived"),
+    schemas.Extra("alert_message"),
+)
+ADMIN_COMMUTE_VIEW = schemas.View(
+    "AdminCommuteRow",
+    schemas.DocumentId("id"),
+    schemas.Value("user"),
+    schemas.Value("date"),
+    schemas.Value("expected_arrival_time"),
+    schemas.Value("travel_mode"),
+    schemas.Value("notes"),
+    schemas.Flag("has_arrived"),
+    schemas.Extra("alert_message"),
+    schemas.Extra("is_alert"),
+)
+CURRENT_AFFAIR_VIEW = schemas.View(
+    "CurrentAffairRow",
+    schemas.DocumentId("id"),
+    schemas.Value("title"),
+    schemas.Value("content"),
+    schemas.Value("category"),
+    schemas.Value("event_date"),
+    schemas.Value("created_by"),
+)
+
+
+def serialize_admin_booking(doc, active_alerts):
+    safety_alert_message = active_alerts.get(doc.id, {}).get("message", "")
+    return ADMIN_BOOKING_VIEW.from_doc(
+        doc, safety_alert=bool(safety_alert_message), safety_alert_message=safety_alert_message
+    )
+
+
+def serialize_admin_commute(doc, active_alerts):
+    alert_message = active_alerts.get(doc.id, {}).get("message", "")
+    return ADMIN_COMMUTE_VIEW.from_doc(doc, alert_message=alert_message, is_alert=bool(alert_message))
+
+
+BOOKING_STATUSES = ("Pending", "Approved", "Rejected")
+
+
+def apply_booking_filters(query, req):
+    """Push the listing filters down as Firestore where-clauses; returns (query, error_response)."""
+    date_from, date_to, date_error = parse_date_range(req)
+    if date_error:
+        return None, date_error
+
+    room = (req.args.get("room") or "").strip()
+    status = (req.args.get("status") or "").strip().capitalize()
+    if status and status not in BOOKING_STATUSES:
+        return None, (jsonify({"error": f"status must be one of: {', '.join(BOOKING_STATUSES)}"}), 400)
+
+    has_arrived = (req.args.get("has_arrived") or "").strip().lower()
+    if has_arrived and has_arrived not in ("true", "false"):
+        return None, (jsonify({"error": "has_arrived must be true or false."}), 400)
+
+    if room:
+        query = query.where("room", "==", room)
+    if status:
+        query = query.where("status", "==", status)
+    if has_arrived:
+        query = query.where("has_arrived", "==", has_arrived == "true")
+    return apply_date_range(query, date_from, date_to), None
+
+
+def commute_listing_queries(req, user_email=None):
+    """Like booking_listing_queries, for commute_eta with a date_from/date_to range."""
+    date_from, date_to, date_error = parse_date_range(req)
+    if date_error:
+        return None, date_error
+    collections = [db.collection("commute_eta")]
+    if wants_archived(req):
+        collections.extend(archive_partitions("commute_eta", date_from, date_to))
+    queries = []
+    for collection in collections:
+        query = collection if user_email is None else collection.where("user", "==", user_email)
+        queries.append(apply_date_range(query, date_from, date_to))
+    return queries, None
+
+
+def booking_listing_queries(req, user_email=None):
+    """The filtered live query, plus one per archive partition with include_archived=true."""
+
+    def scoped(collection):
+        return collection if user_email is None else collection.where("user", "==", user_email)
+
+    query, filter_error = apply_booking_filters(scoped(db.collection("bookings")), req)
+    if filter_error:
+        return None, filter_error
+    queries = [query]
+    if wants_archived(req):
+        date_from, date_to, _ = parse_date_range(req)
+        for partition in archive_partitions("bookings", date_from, date_to):
+            queries.append(apply_booking_filters(scoped(partition), req)[0])
+    return queries, None
+
+
+def serialize_current_affair(doc):
+    return CURRENT_AFFAIR_VIEW.from_doc(doc)
+
+
 @app.route("/api/create-booking", methods=["POST"])
+@idempotent
 def create_booking():
     backend_error = ensure_backend_ready()
     if backend_error:
@@ -175,20 +1387,21 @@ def create_booking():
         return jsonify({"status": "conflict", "message": "Room already booked"}), 400
 
     doc_ref = db.collection("bookings").document()
-    doc_ref.set(
-        {
-            "room": room,
-            "date": date,
-            "start_time": start_time,
-            "end_time": end_time,
-            "expected_arrival_time": expected_arrival_time,
-            "purpose": purpose,
-            "user": user_email,
-            "status": "Pending",
-            "has_arrived": False,
-            "arrival_marked_at": None,
-        }
-    )
+    payload = {
+        "room": room,
+        "date": date,
+        "start_time": start_time,
+        "end_time": end_time,
+        "expected_arrival_time": expected_arrival_time,
+        "purpose": purpose,
+        "user": user_email,
+        "status": "Pending",
+        "has_arrived": False,
+        "arrival_marked_at": None,
+    }
+    if not insert_booking_if_free(db.transaction(), doc_ref, payload):
+        return jsonify({"status": "conflict", "message": "Room already booked"}), 400
+    booking_index.upsert(doc_ref.id, payload)
 
     return jsonify(
         {
@@ -199,7 +1412,107 @@ def create_booking():
     )
 
 
+AVAILABILITY_MAX_DAYS = 31
+AVAILABILITY_MAX_ROOMS = 200
+
+
+def load_availability_index(date_from, date_to):
+    # Dates before the live mirror starts are read once for this request.
+    if booking_index.covers(date_from):
+        return room_availability
+    index = availability.SlotIndex()
+    # Past dates may already have moved to the archive.
+    for collection in [db.collection("bookings")] + archive_partitions("bookings", date_from, date_to):
+        query = (
+            collection.where("date", ">=", date_from)
+            .where("date", "<=", date_to)
+            .select(["room", "date", "start_time", "end_time", "status"])
+        )
+        for doc in query.stream():
+            index.upsert(doc.id, doc.to_dict() or {})
+    return index
+
+
+@app.route("/api/room-availability", methods=["GET"])
+@scan_endpoint
+def get_room_availability():
+    backend_error = ensure_backend_ready()
+    if backend_error:
+        return backend_error
+
+    user = verify_token(request)
+    if not user:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    date_from = (request.args.get("date_from") or "").strip()
+    date_to = (request.args.get("date_to") or "").strip() or date_from
+    try:
+        first = datetime.strptime(date_from, "%Y-%m-%d")
+        last = datetime.strptime(date_to, "%Y-%m-%d")
+    except ValueError:
+        return jsonify({"error": "date_from (and optional date_to) must be YYYY-MM-DD."}), 400
+    day_count = (last - first).days + 1
+    if day_count < 1 or day_count > AVAILABILITY_MAX_DAYS:
+        return jsonify({"error": f"date_to must be within {AVAILABILITY_MAX_DAYS} days on or after date_from."}), 400
+    dates = [(first + timedelta(days=offset)).strftime("%Y-%m-%d") for offset in range(day_count)]
+
+    rooms = None
+    rooms_arg = (request.args.get("rooms") or "").strip()
+    if rooms_arg:
+        rooms = list(dict.fromkeys(room.strip() for room in rooms_arg.split(",") if room.strip()))
+        if len(rooms) > AVAILABILITY_MAX_ROOMS:
+            return jsonify({"error": f"At most {AVAILABILITY_MAX_ROOMS} rooms per request."}), 400
+
+    start_time = (request.args.get("start_time") or "").strip()
+    end_time = (request.args.get("end_time") or "").strip()
+    window_start = availability.time_to_slot(start_time) if start_time else 0
+    window_end = availability.time_to_slot(end_time, round_up=True) if end_time else availability.SLOTS_PER_DAY
+    if window_start is None or window_end is None or window_start >= window_end:
+        return jsonify({"error": "start_time and end_time must be HH:MM with start_time before end_time."}), 400
+    searching = bool(start_time or end_time)
+
+    rooms, busy = load_availability_index(date_from, date_to).busy_grid(dates, rooms)
+    free = availability.free_in_window(busy, window_start, window_end)
+
+    days = []
+    for i, date in enumerate(dates):
+        busy_runs = availability.runs(busy[i])
+        free_runs = availability.runs(~busy[i, :, window_start:window_end])
+        room_rows = []
+        for j, room in enumerate(rooms):
+            room_rows.append(
+                {
+                    "room": room,
+                    "busy": [
+                        {"start_time": availability.slot_to_time(a), "end_time": availability.slot_to_time(b)}
+                        for a, b in busy_runs[j]
+                    ],
+                    "free": [
+                        {
+                            "start_time": availability.slot_to_time(window_start + a),
+                            "end_time": availability.slot_to_time(window_start + b),
+                        }
+                        for a, b in free_runs[j]
+                    ],
+                }
+            )
+        day = {"date": date, "rooms": room_rows}
+        if searching:
+            day["free_rooms"] = [room for room, is_free in zip(rooms, free[i]) if is_free]
+        days.append(day)
+
+    response = {"status": "success", "slot_minutes": availability.SLOT_MINUTES, "days": days}
+    if searching:
+        response["window"] = {
+            "start_time": availability.slot_to_time(window_start),
+            "end_time": availability.slot_to_time(window_end),
+        }
+        response["rooms_free_all_dates"] = [room for room, is_free in zip(rooms, free.all(axis=0)) if is_free]
+    return jsonify(response)
+
+
 @app.route("/api/submit-food-review", methods=["POST"])
+@idempotent
 def submit_food_review():
     user = verify_token(request)
     if not user:
@@ -236,16 +1549,6 @@ def submit_food_review():
     comment = str(data.get("comment", "")).strip()
     user_email = user.get("email", "")
 
-    existing = (
-        db.collection("food_reviews")
-        .where("week", "==", week)
-        .where("hostel", "==", hostel)
-        .where("user", "==", user_email)
-        .limit(1)
-        .stream()
-    )
-    existing_doc = next(existing, None)
-
     payload = {
         "week": week,
         "hostel": hostel,
@@ -258,18 +1561,38 @@ def submit_food_review():
         "updated_at": firestore.SERVER_TIMESTAMP,
     }
 
-    if existing_doc:
-        db.collection("food_reviews").document(existing_doc.id).update(payload)
-        return jsonify({"status": "success", "message": "Food review updated", "review_id": existing_doc.id})
+    review_id, created = upsert_food_review(db.transaction(), payload)
+    if not created:
+        return jsonify({"status": "success", "message": "Food review updated", "review_id": review_id})
+
+    return jsonify({"status": "success", "message": "Food review submitted", "review_id": review_id})
+
+
+def commute_eta_id(user_email, date_value):
+    return stable_document_id("commute_eta", user_email, date_value)
+
+
+@storage.transactional
+def upsert_commute_eta(transaction, payload):
+    entry_ref = db.collection("commute_eta").document(commute_eta_id(payload["user"], payload["date"]))
+    snapshot = entry_ref.get(transaction=transaction)
+    existing = (snapshot.to_dict() or {}) if snapshot.exists else {}
+
+    # Resubmitting the ETA after arriving keeps the arrival.
+    payload = dict(payload)
+    payload["has_arrived"] = bool(existing.get("has_arrived"))
+    payload["arrival_marked_at"] = existing.get("arrival_marked_at") if payload["has_arrived"] else None
 
-    doc_ref = db.collection("food_reviews").document()
-    payload["created_at"] = firestore.SERVER_TIMESTAMP
-    doc_ref.set(payload)
+    if snapshot.exists:
+        transaction.update(entry_ref, payload)
+        return entry_ref.id, False
 
-    return jsonify({"status": "success", "message": "Food review submitted", "review_id": doc_ref.id})
+    transaction.set(entry_ref, {**payload, "created_at": firestore.SERVER_TIMESTAMP})
+    return entry_ref.id, True
 
 
 @app.route("/api/submit-commute-eta", methods=["POST"])
+@idempotent
 def submit_commute_eta():
     user = verify_token(request)
     if not user:
@@ -290,38 +1613,17 @@ def submit_commute_eta():
     if parse_datetime_parts(date_value, expected_arrival_time) is None:
         return jsonify({"error": "Invalid date or expected arrival time."}), 400
 
-    existing = (
-        db.collection("commute_eta")
-        .where("user", "==", user_email)
-        .where("date", "==", date_value)
-        .limit(1)
-        .stream()
-    )
-    existing_doc = next(existing, None)
-
     payload = {
         "user": user_email,
         "date": date_value,
         "expected_arrival_time": expected_arrival_time,
         "travel_mode": travel_mode,
         "notes": notes,
-        "has_arrived": False,
-        "arrival_marked_at": None,
         "updated_at": firestore.SERVER_TIMESTAMP,
     }
-
-    if existing_doc:
-        existing_data = existing_doc.to_dict() or {}
-        if bool(existing_data.get("has_arrived")):
-            payload["has_arrived"] = True
-            payload["arrival_marked_at"] = existing_data.get("arrival_marked_at")
-        db.collection("commute_eta").document(existing_doc.id).update(payload)
-        return jsonify({"status": "success", "message": "Commute ETA updated", "id": existing_doc.id})
-
-    doc_ref = db.collection("commute_eta").document()
-    payload["created_at"] = firestore.SERVER_TIMESTAMP
-    doc_ref.set(payload)
-    return jsonify({"status": "success", "message": "Commute ETA submitted", "id": doc_ref.id})
+    entry_id, created = upsert_commute_eta(db.transaction(), payload)
+    message = "Commute ETA submitted" if created else "Commute ETA updated"
+    return jsonify({"status": "success", "message": message, "id": entry_id})
 
 
 @app.route("/api/get-commute-entries", methods=["GET"])
@@ -331,28 +1633,25 @@ def get_commute_entries():
         return jsonify({"error": "Unauthorized"}), 401
 
     user_email = user.get("email", "")
-    docs = db.collection("commute_eta").where("user", "==", user_email).stream()
+    queries, filter_error = commute_listing_queries(request, user_email)
+    if filter_error:
+        return filter_error
 
-    entries = []
-    for doc in docs:
-        data = doc.to_dict() or {}
-        entries.append(
-            {
-                "id": doc.id,
-                "date": data.get("date", ""),
-                "expected_arrival_time": data.get("expected_arrival_time", ""),
-                "travel_mode": data.get("travel_mode", ""),
-                "notes": data.get("notes", ""),
-                "has_arrived": bool(data.get("has_arrived")),
-                "alert_message": get_commute_alert_message(data),
-            }
-        )
+    queries = [query.select(COMMUTE_ENTRY_VIEW.projection) for query in queries]
+    docs, active_alerts = run_concurrently(
+        lambda: [doc for query in queries for doc in query.stream()], lambda: load_active_alerts("commute", user_email)
+    )
 
-    entries.sort(key=lambda e: (e["date"], e["expected_arrival_time"]), reverse=True)
+    entries = [
+        COMMUTE_ENTRY_VIEW.from_doc(doc, alert_message=active_alerts.get(doc.id, {}).get("message", ""))
+        for doc in docs
+    ]
+    entries.sort(key=attrgetter("date", "expected_arrival_time"), reverse=True)
     return jsonify({"status": "success", "entries": entries})
 
 
 @app.route("/api/mark-commute-arrived", methods=["POST"])
+@idempotent
 def mark_commute_arrived():
     user = verify_token(request)
     if not user:
@@ -374,11 +1673,15 @@ def mark_commute_arrived():
     if not (is_owner or is_admin_user(user)):
         return jsonify({"error": "Forbidden"}), 403
 
-    doc_ref.update({"has_arrived": True, "arrival_marked_at": firestore.SERVER_TIMESTAMP})
+    run_concurrently(
+        lambda: doc_ref.update({"has_arrived": True, "arrival_marked_at": firestore.SERVER_TIMESTAMP}),
+        lambda: overdue_scheduler.cancel(f"commute_{entry_id}", resolve=True),
+    )
     return jsonify({"status": "success", "message": "Commute arrival marked successfully"})
 
 
 @app.route("/api/get-admin-commute-alerts", methods=["GET"])
+@scan_endpoint
 def get_admin_commute_alerts():
     user = verify_token(request)
     if not user:
@@ -386,32 +1689,42 @@ def get_admin_commute_alerts():
     if not is_admin_user(user):
         return jsonify({"error": "Forbidden"}), 403
 
-    docs = db.collection("commute_eta").stream()
+    order_fields = ["date", "expected_arrival_time"]
+    limit, cursor, page_error = parse_page_args(request, len(order_fields) + 1)
+    if page_error:
+        return page_error
 
-    alerts = []
-    entries = []
-    for doc in docs:
-        data = doc.to_dict() or {}
-        alert_message = get_commute_alert_message(data)
-        is_alert = bool(alert_message)
-        item = {
-            "id": doc.id,
-            "user": data.get("user", ""),
-            "date": data.get("date", ""),
-            "expected_arrival_time": data.get("expected_arrival_time", ""),
-            "travel_mode": data.get("travel_mode", ""),
-            "notes": data.get("notes", ""),
-            "has_arrived": bool(data.get("has_arrived")),
-            "alert_message": alert_message,
-            "is_alert": is_alert,
-        }
-        entries.append(item)
-        if is_alert:
-            alerts.append(item)
+    queries, filter_error = commute_listing_queries(request)
+    if filter_error:
+        return filter_error
+    queries = [query.select(ADMIN_COMMUTE_VIEW.projection) for query in queries]
+
+    streaming = wants_ndjson(request)
+    load_docs = listing_loader(queries, order_fields, limit, cursor, streaming, direction=storage.DESCENDING)
+    (docs, next_cursor), active_alerts = run_concurrently(load_docs, lambda: load_active_alerts("commute"))
 
-    entries.sort(key=lambda e: (e["date"], e["expected_arrival_time"]), reverse=True)
+    alerts = [serialize_commute_alert(alert) for alert in active_alerts.values()]
     alerts.sort(key=lambda e: (e["date"], e["expected_arrival_time"]))
-    return jsonify({"status": "success", "alerts": alerts, "entries": entries})
+
+    if streaming:
+        return ndjson_response(stream_admin_commute_records(docs, active_alerts, alerts, limit, next_cursor))
+
+    entries = [serialize_admin_commute(doc, active_alerts) for doc in docs]
+    entries.sort(key=attrgetter("date", "expected_arrival_time"), reverse=True)
+    response = {"status": "success", "alerts": alerts, "entries": entries}
+    if limit is not None:
+        response["next_cursor"] = next_cursor
+    return jsonify(response)
+
+
+def stream_admin_commute_records(docs, active_alerts, alerts, limit, next_cursor):
+    for doc in docs:
+        yield {"type": "entry", "entry": serialize_admin_commute(doc, active_alerts)}
+
+    trailer = {"type": "alerts", "status": "success", "alerts": alerts}
+    if limit is not None:
+        trailer["next_cursor"] = next_cursor
+    yield trailer
 
 
 @app.route("/api/get-food-review-summary", methods=["GET"])
@@ -424,50 +1737,30 @@ def get_food_review_summary():
     if not is_valid_week_format(week):
         return jsonify({"error": "Invalid or missing week. Use YYYY-Www."}), 400
 
-    docs = db.collection("food_reviews").where("week", "==", week).stream()
-
-    hostel_map = {}
-    for doc in docs:
-        data = doc.to_dict()
-        hostel = data.get("hostel", "Unknown Hostel")
-        if hostel not in hostel_map:
-            hostel_map[hostel] = {
-                "hostel": hostel,
-                "review_count": 0,
-                "taste_total": 0,
-                "hygiene_total": 0,
-                "variety_total": 0,
-                "overall_total": 0,
-                "comments": [],
-            }
-
-        item = hostel_map[hostel]
-        taste = int(data.get("taste_rating", 0) or 0)
-        hygiene = int(data.get("hygiene_rating", 0) or 0)
-        variety = int(data.get("variety_rating", 0) or 0)
-        overall = float(data.get("overall_rating", 0) or 0)
-        comment = (data.get("comment", "") or "").strip()
-
-        item["review_count"] += 1
-        item["taste_total"] += taste
-        item["hygiene_total"] += hygiene
-        item["variety_total"] += variety
-        item["overall_total"] += overall
-        if comment and len(item["comments"]) < 3:
-            item["comments"].append(comment)
+    if week not in food_review_weeks_aggregated and not food_review_week_ref(week).get().exists:
+        # Weeks reviewed before aggregates existed are backfilled for every
+        # hostel on first read; a submit since then only seeds its own hostel.
+        aggregates = rebuild_food_review_aggregates(week)
+    else:
+        food_review_weeks_aggregated.add(week)
+        aggregates = [
+            doc.to_dict() or {} for doc in db.collection("food_review_aggregates").where("week", "==", week).stream()
+        ]
 
     summary = []
-    for hostel, item in hostel_map.items():
-        count = item["review_count"] or 1
+    for item in aggregates:
+        review_count = int(item.get("review_count", 0) or 0)
+        if review_count <= 0:
+            continue
         summary.append(
             {
-                "hostel": hostel,
-                "review_count": item["review_count"],
-                "avg_taste": round(item["taste_total"] / count, 2),
-                "avg_hygiene": round(item["hygiene_total"] / count, 2),
-                "avg_variety": round(item["variety_total"] / count, 2),
-                "avg_overall": round(item["overall_total"] / count, 2),
-                "sample_comments": item["comments"],
+                "hostel": item.get("hostel", "Unknown Hostel"),
+                "review_count": review_count,
+                "avg_taste": round(item.get("taste_total", 0) / review_count, 2),
+                "avg_hygiene": round(item.get("hygiene_total", 0) / review_count, 2),
+                "avg_variety": round(item.get("variety_total", 0) / review_count, 2),
+                "avg_overall": round(item.get("overall_total", 0) / review_count, 2),
+                "sample_comments": [entry.get("comment", "") for entry in item.get("sample_comments", [])],
             }
         )
 
@@ -476,19 +1769,289 @@ def get_food_review_summary():
     return jsonify({"status": "success", "week": week, "hostels": summary})
 
 
+@app.route("/api/admin/food-review-aggregates/rebuild", methods=["POST"])
+@scan_endpoint
+@idempotent
+def rebuild_food_review_summary():
+    user = verify_token(request)
+    if not user:
+        return jsonify({"error": "Unauthorized"}), 401
+    if not is_admin_user(user):
+        return jsonify({"error": "Forbidden"}), 403
+
+    data = request.get_json(silent=True) or {}
+    week = str(data.get("week", "")).strip()
+    if not is_valid_week_format(week):
+        return jsonify({"error": "Invalid or missing week. Use YYYY-Www."}), 400
+
+    aggregates = rebuild_food_review_aggregates(week)
+    return jsonify({"status": "success", "week": week, "hostels": len(aggregates)})
+
+
+FOOD_REVIEW_SNAPSHOT_DIR = os.getenv("FOOD_REVIEW_SNAPSHOT_DIR") or str(
+    Path(__file__).with_name("snapshots") / "food_reviews"
+)
+FOOD_REVIEW_SNAPSHOT_INTERVAL_SECONDS = int(os.getenv("FOOD_REVIEW_SNAPSHOT_INTERVAL_SECONDS", "900"))
+FOOD_REVIEW_TRENDS_MAX_WEEKS = 104
+FOOD_REVIEW_TRENDS_MAX_WINDOW = 12
+
+food_review_snapshot = review_snapshot.FoodReviewSnapshot(FOOD_REVIEW_SNAPSHOT_DIR)
+
+
+def start_food_review_snapshot_refresher():
+    def run():
+        while True:
+            time.sleep(FOOD_REVIEW_SNAPSHOT_INTERVAL_SECONDS)
+            # Workers share the snapshot directory; skip if another one just refreshed it.
+            age = food_review_snapshot.age_seconds()
+            if age is not None and age < FOOD_REVIEW_SNAPSHOT_INTERVAL_SECONDS / 2:
+                continue
+            try:
+                food_review_snapshot.refresh(db, wait=False)
+            except Exception:
+                app.logger.warning("Could not refresh the food review snapshot", exc_info=True)
+
+    thread = threading.Thread(target=run, name="food-review-snapshot", daemon=True)
+    thread.start()
+    return thread
+
+
+@app.route("/api/food-review-trends", methods=["GET"])
+@scan_endpoint
+def get_food_review_trends():
+    backend_error = ensure_backend_ready()
+    if backend_error:
+        return backend_error
+
+    user = verify_token(request)
+    if not user:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    week_from = (request.args.get("week_from") or "").strip()
+    week_to = (request.args.get("week_to") or "").strip() or week_from
+    if not is_valid_week_format(week_from) or not is_valid_week_format(week_to):
+        return jsonify({"error": "week_from (and optional week_to) must be YYYY-Www."}), 400
+    try:
+        weeks = review_snapshot.iso_week_range(week_from, week_to)
+    except ValueError:
+        return jsonify({"error": "week_from and week_to must be valid ISO weeks."}), 400
+    if not weeks or len(weeks) > FOOD_REVIEW_TRENDS_MAX_WEEKS:
+        return jsonify({"error": f"week_to must be within {FOOD_REVIEW_TRENDS_MAX_WEEKS} weeks on or after week_from."}), 400
+
+    try:
+        window = int(request.args.get("window", 4))
+    except ValueError:
+        return jsonify({"error": "window must be an integer."}), 400
+    if window < 1 or window > FOOD_REVIEW_TRENDS_MAX_WINDOW:
+        return jsonify({"error": f"window must be between 1 and {FOOD_REVIEW_TRENDS_MAX_WINDOW}."}), 400
+
+    hostels = None
+    hostels_arg = (request.args.get("hostel") or "").strip()
+    if hostels_arg:
+        hostels = list(dict.fromkeys(hostel.strip() for hostel in hostels_arg.split(",") if hostel.strip()))
+
+    columns = food_review_snapshot.load()
+    if columns is None:
+        # First request on a fresh disk builds the snapshot once.
+        food_review_snapshot.refresh(db)
+        columns = food_review_snapshot.load()
+
+    return jsonify(
+        {
+            "status": "success",
+            "weeks": weeks,
+            "window": window,
+            "hostels": review_snapshot.compute_trends(columns, weeks, hostels, window),
+            "snapshot": {"rows": columns.rows, "watermark": columns.meta.get("watermark")},
+        }
+    )
+
+
+@app.route("/api/admin/food-review-snapshot/refresh", methods=["POST"])
+@scan_endpoint
+@idempotent
+def refresh_food_review_snapshot():
+    backend_error = ensure_backend_ready()
+    if backend_error:
+        return backend_error
+
+    user = verify_token(request)
+    if not user:
+        return jsonify({"error": "Unauthorized"}), 401
+    if not is_admin_user(user):
+        return jsonify({"error": "Forbidden"}), 403
+
+    data = request.get_json(silent=True) or {}
+    stats = food_review_snapshot.refresh(db, full=bool(data.get("full")))
+    return jsonify({"status": "success", **stats})
+
+
+class CurrentAffairsCache:
+    """Pre-encoded /api/current-affairs body keyed by the collection version counter.
+
+    The version lives in `collection_versions/current_affairs` and is bumped in
+    the same batch as every admin write; a listener mirrors it here so that
+    revalidation needs no Firestore reads.
+    """
+
+    def __init__(self):
+        self.version = None
+        # Content-encoding ("identity", "gzip", "br") -> bytes for _body_version.
+        self._bodies = {}
+        self._body_version = None
+        self._lock = threading.Lock()
+
+    @property
+    def etag(self):
+        version = self.version
+        return None if version is None else f"current-affairs-v{version}"
+
+    def set_version(self, version):
+        with self._lock:
+            self.version = version
+
+    def invalidate(self, version):
+        """Stops serving `version`, the counter read before a write committed.
+
+        Until the listener delivers the bumped counter, responses are built
+        uncached. If it already has, the newer version is kept.
+        """
+        with self._lock:
+            if self.version == version:
+                self.version = None
+
+    def get_body(self, version, encoding="identity"):
+        with self._lock:
+            if version is not None and self._body_version == version:
+                return self._bodies.get(encoding)
+            return None
+
+    def store_body(self, version, body, encoding="identity"):
+        with self._lock:
+            if version is not None and self.version == version:
+                if self._body_version != version:
+                    self._bodies = {}
+                    self._body_version = version
+                self._bodies[encoding] = body
+
+    def on_snapshot(self, doc_snapshots, changes, read_time):
+        for snapshot in doc_snapshots:
+            self.set_version(int((snapshot.to_dict() or {}).get("version", 0)))
+        if not doc_snapshots:
+            self.set_version(0)
+
+
+current_affairs_cache = CurrentAffairsCache()
+
+
+def current_affairs_version_ref():
+    return db.collection("collection_versions").document("current_affairs")
+
+
+def commit_current_affairs_write(batch):
+    version = current_affairs_cache.version
+    batch.set(current_affairs_version_ref(), {"version": firestore.Increment(1)}, merge=True)
+    batch.commit()
+    current_affairs_cache.invalidate(version)
+
+
 @app.route("/api/current-affairs", methods=["GET"])
 def get_current_affairs():
     user = verify_token(request)
     if not user:
         return jsonify({"error": "Unauthorized"}), 401
 
-    docs = db.collection("current_affairs").stream()
-    items = [serialize_current_affair(doc) for doc in docs]
-    items.sort(key=lambda x: (x["event_date"], x["id"]), reverse=True)
-    return jsonify({"status": "success", "items": items})
+    version = current_affairs_cache.version
+    etag = current_affairs_cache.etag
+    # The identity, gzip and brotli bodies share one tag, so it is weak: they
+    # are equivalent representations, not byte-identical ones.
+    if etag and request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        response.vary.add("Accept-Encoding")
+        return response
+
+    body = current_affairs_cache.get_body(version)
+    if body is None:
+        docs = db.collection("current_affairs").select(CURRENT_AFFAIR_VIEW.projection).stream()
+        items = [serialize_current_affair(doc) for doc in docs]
+        items.sort(key=attrgetter("event_date", "id"), reverse=True)
+        body = app.json.dumps_bytes({"status": "success", "items": items}) + b"\n"
+        current_affairs_cache.store_body(version, body)
+
+    response = Response(body, mimetype="application/json")
+    encoding = compression.negotiate(request)
+    if encoding and len(body) >= compression.COMPRESSION_MIN_BYTES:
+        # Compressed once per version and encoding, not on every hit.
+        encoded = current_affairs_cache.get_body(version, encoding)
+        if encoded is None:
+            encoded = compression.compress(body, encoding, cached=True)
+            current_affairs_cache.store_body(version, encoded, encoding)
+        compression.set_encoded_body(response, encoded, encoding)
+    response.vary.add("Accept-Encoding")
+    if etag:
+        response.set_etag(etag, weak=True)
+        response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+SEARCH_DEFAULT_PAGE_SIZE = int(os.getenv("SEARCH_DEFAULT_PAGE_SIZE", "20"))
+SEARCH_MAX_QUERY_LENGTH = int(os.getenv("SEARCH_MAX_QUERY_LENGTH", "200"))
+SEARCH_READY_TIMEOUT_SECONDS = 5
+
+# Mirrors current_affairs from a listener started in start_worker.
+current_affairs_index = search.CurrentAffairsIndex()
+
+
+@app.route("/api/current-affairs/search", methods=["GET"])
+def search_current_affairs():
+    backend_error = ensure_backend_ready()
+    if backend_error:
+        return backend_error
+
+    user = verify_token(request)
+    if not user:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    query = (request.args.get("q") or "").strip()
+    if len(query) > SEARCH_MAX_QUERY_LENGTH:
+        return jsonify({"error": f"q must be at most {SEARCH_MAX_QUERY_LENGTH} characters."}), 400
+    category = (request.args.get("category") or "").strip()
+    date_from, date_to, date_error = parse_date_range(request)
+    if date_error:
+        return date_error
+
+    # The cursor holds the offset of the next page.
+    limit, cursor, page_error = parse_page_args(request, 1)
+    if page_error:
+        return page_error
+    limit = limit or SEARCH_DEFAULT_PAGE_SIZE
+    offset = 0
+    if cursor:
+        if not cursor[0].isdigit():
+            return jsonify({"error": "Invalid cursor."}), 400
+        offset = int(cursor[0])
+
+    if not current_affairs_index.ready.wait(SEARCH_READY_TIMEOUT_SECONDS):
+        response = jsonify({"error": "Search index is still loading."})
+        response.headers["Retry-After"] = "1"
+        return response, 503
+
+    with tracing.span("search", terms=len(search.tokenize(query))):
+        total, items = current_affairs_index.search(query, category, date_from, date_to, offset, limit)
+    next_offset = offset + len(items)
+    return jsonify(
+        {
+            "status": "success",
+            "items": items,
+            "total": total,
+            "next_cursor": encode_page_cursor([str(next_offset)]) if next_offset < total else None,
+        }
+    )
 
 
 @app.route("/api/admin/current-affairs", methods=["POST"])
+@idempotent
 def create_current_affair():
     user = verify_token(request)
     if not user:
@@ -513,7 +2076,9 @@ def create_current_affair():
         return jsonify({"error": "Invalid event date. Use YYYY-MM-DD."}), 400
 
     doc_ref = db.collection("current_affairs").document()
-    doc_ref.set(
+    batch = db.batch()
+    batch.set(
+        doc_ref,
         {
             "title": title,
             "content": content,
@@ -522,8 +2087,9 @@ def create_current_affair():
             "created_by": user.get("email", ""),
             "created_at": firestore.SERVER_TIMESTAMP,
             "updated_at": firestore.SERVER_TIMESTAMP,
-        }
+        },
     )
+    commit_current_affairs_write(batch)
     return jsonify({"status": "success", "message": "Current affair added", "id": doc_ref.id})
 
 
@@ -556,15 +2122,18 @@ def update_current_affair(affair_id):
     if not snapshot.exists:
         return jsonify({"error": "Current affair not found"}), 404
 
-    doc_ref.update(
+    batch = db.batch()
+    batch.update(
+        doc_ref,
         {
             "title": title,
             "content": content,
             "category": category,
             "event_date": event_date,
             "updated_at": firestore.SERVER_TIMESTAMP,
-        }
+        },
     )
+    commit_current_affairs_write(batch)
     return jsonify({"status": "success", "message": "Current affair updated"})
 
 
@@ -581,7 +2150,9 @@ def delete_current_affair(affair_id):
     if not snapshot.exists:
         return jsonify({"error": "Current affair not found"}), 404
 
-    doc_ref.delete()
+    batch = db.batch()
+    batch.delete(doc_ref)
+    commit_current_affairs_write(batch)
     return jsonify({"status": "success", "message": "Current affair deleted"})
 
 
@@ -596,31 +2167,25 @@ def get_bookings():
         return jsonify({"error": "Unauthorized"}), 401
 
     user_email = user.get("email", "")
-    docs = db.collection("bookings").where("user", "==", user_email).stream()
+    queries, filter_error = booking_listing_queries(request, user_email)
+    if filter_error:
+        return filter_error
 
-    booking_list = []
-    for doc in docs:
-        data = doc.to_dict()
-        booking_list.append(
-            {
-                "id": doc.id,
-                "room": data.get("room", ""),
-                "date": data.get("date", ""),
-                "start_time": data.get("start_time", ""),
-                "end_time": data.get("end_time", ""),
-                "expected_arrival_time": data.get("expected_arrival_time", ""),
-                "purpose": data.get("purpose", ""),
-                "status": data.get("status", "Pending"),
-                "has_arrived": bool(data.get("has_arrived")),
-                "safety_alert_message": get_safety_alert_message(data),
-            }
-        )
+    queries = [query.select(BOOKING_VIEW.projection) for query in queries]
+    docs, active_alerts = run_concurrently(
+        lambda: list(stream_merged(queries, ["date", "start_time"])), lambda: load_active_alerts("booking", user_email)
+    )
+
+    booking_list = [
+        BOOKING_VIEW.from_doc(doc, safety_alert_message=active_alerts.get(doc.id, {}).get("message", ""))
+        for doc in docs
+    ]
 
-    booking_list.sort(key=lambda b: (b["date"], b["start_time"]))
     return jsonify({"status": "success", "bookings": booking_list})
 
 
 @app.route("/api/get-all-bookings", methods=["GET"])
+@scan_endpoint
 def get_all_bookings():
     backend_error = ensure_backend_ready()
     if backend_error:
@@ -632,48 +2197,311 @@ def get_all_bookings():
     if not is_admin_user(user):
         return jsonify({"error": "Forbidden"}), 403
 
-    docs = db.collection("bookings").stream()
-    booking_list = []
-    safety_alerts = []
+    order_fields = ["date", "start_time"]
+    limit, cursor, page_error = parse_page_args(request, len(order_fields) + 1)
+    if page_error:
+        return page_error
+
+    queries, filter_error = booking_listing_queries(request)
+    if filter_error:
+        return filter_error
+    queries = [query.select(ADMIN_BOOKING_VIEW.projection) for query in queries]
+
+    streaming = wants_ndjson(request)
+    load_docs = listing_loader(queries, order_fields, limit, cursor, streaming)
+    (docs, next_cursor), active_alerts = run_concurrently(load_docs, lambda: load_active_alerts("booking"))
+
+    safety_alerts = [serialize_safety_alert(alert) for alert in active_alerts.values()]
+    safety_alerts.sort(key=lambda a: (a["date"], a["expected_arrival_time"]))
+
+    if streaming:
+        return ndjson_response(stream_admin_booking_records(docs, active_alerts, safety_alerts, limit, next_cursor))
+
+    booking_list = [serialize_admin_booking(doc, active_alerts) for doc in docs]
+    booking_list.sort(key=attrgetter("date", "start_time"))
+    response = {"status": "success", "bookings": booking_list, "safety_alerts": safety_alerts}
+    if limit is not None:
+        response["next_cursor"] = next_cursor
+    return jsonify(response)
+
+
+def stream_admin_booking_records(docs, active_alerts, safety_alerts, limit, next_cursor):
     for doc in docs:
-        data = doc.to_dict()
-        safety_alert_message = get_safety_alert_message(data)
-        safety_alert = bool(safety_alert_message)
-        if safety_alert:
-            safety_alerts.append(
-                {
-                    "booking_id": doc.id,
-                    "user": data.get("user", ""),
-                    "room": data.get("room", ""),
-                    "date": data.get("date", ""),
-                    "expected_arrival_time": data.get("expected_arrival_time", ""),
-                    "message": safety_alert_message,
-                }
+        yield {"type": "booking", "booking": serialize_admin_booking(doc, active_alerts)}
+
+    trailer = {"type": "safety_alerts", "status": "success", "safety_alerts": safety_alerts}
+    if limit is not None:
+        trailer["next_cursor"] = next_cursor
+    yield trailer
+
+
+SSE_HEARTBEAT_SECONDS = int(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+SSE_CLIENT_QUEUE_SIZE = int(os.getenv("SSE_CLIENT_QUEUE_SIZE", "1000"))
+SSE_REPLAY_EVENTS = int(os.getenv("SSE_REPLAY_EVENTS", "500"))
+# Under gthread workers each open stream holds a request thread for as long as
+# it stays open, so by default streams may take at most half of them.
+SSE_MAX_SUBSCRIBERS = int(os.getenv("SSE_MAX_SUBSCRIBERS") or max(1, int(os.getenv("GUNICORN_THREADS", "4")) // 2))
+SSE_RETRY_AFTER_SECONDS = 30
+
+
+class EventSubscriber:
+    def __init__(self, queue_size):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+
+class AdminEventHub:
+    """Fans booking, commute and overdue-alert changes out to admin SSE clients.
+
+    Bookings arrive through the booking index listener; commute entries and
+    the alerts written by the overdue-alert worker get listeners of their own
+    once the first client subscribes. Each event is encoded once and the same
+    bytes are queued for every subscriber. Recent events are kept so a
+    reconnecting client can resume from Last-Event-ID.
+    """
+
+    def __init__(self, replay_size, queue_size, max_subscribers):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        self._recent = deque(maxlen=replay_size)
+        self._sequence = 0
+        self._stream_id = None
+        self._pid = None
+        self._bookings = {}
+        self._bookings_loaded = False
+        self._commutes = {}
+        self._commutes_loaded = False
+        self._commute_watch = None
+        self._alerts = set()
+        self._alerts_loaded = False
+        self._alert_watch = None
+        self._lock = threading.Lock()
+
+    def _ensure_process(self):
+        # Event ids are only meaningful within one process; a forked worker
+        # starts a fresh stream (and a reconnect to it is told to reload).
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._stream_id = f"{os.getpid():x}{random.getrandbits(32):08x}"
+            self._sequence = 0
+            self._recent.clear()
+            self._subscribers = set()
+            self._commute_watch = None
+            self._alert_watch = None
+            self._alerts = set()
+            self._alerts_loaded = False
+
+    def subscribe(self, last_event_id=None):
+        """Returns (subscriber, replay events, whether the client must reload).
+
+        The subscriber is None when this worker already streams to
+        max_subscribers clients.
+        """
+        subscriber = EventSubscriber(self.queue_size)
+        with self._lock:
+            self._ensure_process()
+            if len(self._subscribers) >= self.max_subscribers:
+                return None, [], False
+            self._subscribers.add(subscriber)
+            start_watch = self._commute_watch is None
+            if start_watch:
+                self._commute_watch = True
+            replay, reset = [], False
+            if last_event_id:
+                stream_id, _, sequence = last_event_id.partition("-")
+                if stream_id != self._stream_id or not sequence.isdigit():
+                    reset = True
+                else:
+                    sequence = int(sequence)
+                    replay = [event for seq, event in self._recent if seq > sequence]
+                    if sequence < self._sequence and (not self._recent or self._recent[0][0] > sequence + 1):
+                        reset = True
+        if start_watch:
+            self._start_commute_watch()
+            self._start_alert_watch()
+        return subscriber, replay, reset
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def _start_commute_watch(self):
+        try:
+            query = db.collection("commute_eta").where("date", ">=", datetime.now().strftime("%Y-%m-%d"))
+            watch = query.on_snapshot(self.on_commutes_snapshot)
+        except Exception:
+            app.logger.warning("Could not start the commute event listener", exc_info=True)
+            watch = None
+        with self._lock:
+            self._commute_watch = watch
+
+    def _start_alert_watch(self):
+        try:
+            watch = db.collection("alerts").on_snapshot(self.on_alerts_snapshot)
+        except Exception:
+            app.logger.warning("Could not start the alert event listener", exc_info=True)
+            watch = None
+        with self._lock:
+            self._alert_watch = watch
+
+    def has_alert(self, alert_id):
+        return alert_id in self._alerts
+
+    def publish(self, event_type, payload):
+        data = app.json.dumps_bytes(payload)
+        with self._lock:
+            self._ensure_process()
+            self._sequence += 1
+            event = (
+                f"id: {self._stream_id}-{self._sequence}\nevent: {event_type}\ndata: ".encode("utf-8")
+                + data
+                + b"\n\n"
+            )
+            self._recent.append((self._sequence, event))
+            for subscriber in list(self._subscribers):
+                try:
+                    subscriber.queue.put_nowait(event)
+                except queue.Full:
+                    # A client this far behind reloads instead of blocking the listener.
+                    subscriber.overflowed = True
+                    self._subscribers.discard(subscriber)
+
+    def on_bookings_snapshot(self, col_snapshot, changes, read_time):
+        initial = not self._bookings_loaded
+        for change in changes:
+            doc = change.document
+            previous = self._bookings.get(doc.id)
+            if change.type.name == "REMOVED":
+                self._bookings.pop(doc.id, None)
+                if not initial:
+                    self.publish("booking_removed", {"id": doc.id})
+                continue
+
+            data = doc.to_dict() or {}
+            current = (data.get("status", "Pending"), bool(data.get("has_arrived")))
+            self._bookings[doc.id] = current
+            if initial or previous == current:
+                continue
+            alert_message = BOOKING_ALERT_MESSAGE if self.has_alert(f"booking_{doc.id}") else ""
+            booking = ADMIN_BOOKING_VIEW.from_doc(
+                doc, safety_alert=bool(alert_message), safety_alert_message=alert_message
             )
+            if previous is None:
+                self.publish("booking_created", {"booking": booking})
+            elif current[1] and not previous[1]:
+                self.publish("booking_arrived", {"booking": booking})
+            else:
+                self.publish("booking_updated", {"booking": booking})
+        self._bookings_loaded = True
+
+    def on_commutes_snapshot(self, col_snapshot, changes, read_time):
+        initial = not self._commutes_loaded
+        for change in changes:
+            doc = change.document
+            previous = self._commutes.get(doc.id)
+            if change.type.name == "REMOVED":
+                self._commutes.pop(doc.id, None)
+                if not initial:
+                    self.publish("commute_removed", {"id": doc.id})
+                continue
+
+            data = doc.to_dict() or {}
+            current = (data.get("expected_arrival_time", ""), bool(data.get("has_arrived")))
+            self._commutes[doc.id] = current
+            if initial or previous == current:
+                continue
+            alert_message = COMMUTE_ALERT_MESSAGE if self.has_alert(f"commute_{doc.id}") else ""
+            entry = ADMIN_COMMUTE_VIEW.from_doc(doc, alert_message=alert_message, is_alert=bool(alert_message))
+            if previous is None:
+                self.publish("commute_created", {"entry": entry})
+            elif current[1] and not previous[1]:
+                self.publish("commute_arrived", {"entry": entry})
+            else:
+                self.publish("commute_updated", {"entry": entry})
+        self._commutes_loaded = True
+
+    def on_alerts_snapshot(self, col_snapshot, changes, read_time):
+        initial = not self._alerts_loaded
+        for change in changes:
+            doc = change.document
+            if change.type.name == "REMOVED":
+                self._alerts.discard(doc.id)
+                if not initial:
+                    self.publish_alert_cleared(doc.id)
+                continue
+            self._alerts.add(doc.id)
+            if not initial:
+                self.publish_alert(doc.to_dict() or {})
+        self._alerts_loaded = True
+
+    def publish_alert(self, record):
+        if record.get("kind") == "booking":
+            self.publish("overdue_alert", {"kind": "booking", "alert": serialize_safety_alert(record)})
+        else:
+            self.publish("overdue_alert", {"kind": "commute", "alert": serialize_commute_alert(record)})
+
+    def publish_alert_cleared(self, alert_id):
+        kind, _, ref_id = alert_id.partition("_")
+        self.publish("alert_cleared", {"kind": kind, "id": ref_id})
+
+
+admin_events = AdminEventHub(SSE_REPLAY_EVENTS, SSE_CLIENT_QUEUE_SIZE, SSE_MAX_SUBSCRIBERS)
+
+
+def stream_admin_events(subscriber, replay, reset):
+    try:
+        yield b"retry: 5000\n\n"
+        if reset:
+            # Missed events are no longer available: reload, then keep listening.
+            yield b"event: reset\ndata: {}\n\n"
+        for event in replay:
+            yield event
+        while True:
+            try:
+                event = subscriber.queue.get(timeout=SSE_HEARTBEAT_SECONDS)
+            except queue.Empty:
+                if subscriber.overflowed:
+                    break
+                yield b": keepalive\n\n"
+                continue
+            yield event
+            if subscriber.overflowed and subscriber.queue.empty():
+                break
+        yield b"event: reset\ndata: {}\n\n"
+    finally:
+        admin_events.unsubscribe(subscriber)
+
+
+@app.route("/api/admin/events", methods=["GET"])
+@unmetered
+def get_admin_events():
+    backend_error = ensure_backend_ready()
+    if backend_error:
+        return backend_error
 
-        booking_list.append(
-            {
-                "id": doc.id,
-                "room": data.get("room", ""),
-                "date": data.get("date", ""),
-                "start_time": data.get("start_time", ""),
-                "end_time": data.get("end_time", ""),
-                "expected_arrival_time": data.get("expected_arrival_time", ""),
-                "purpose": data.get("purpose", ""),
-                "user": data.get("user", ""),
-                "status": data.get("status", "Pending"),
-                "has_arrived": bool(data.get("has_arrived")),
-                "safety_alert": safety_alert,
-                "safety_alert_message": safety_alert_message,
-            }
-        )
+    user = verify_token(request)
+    if not user:
+        return jsonify({"error": "Unauthorized"}), 401
+    if not is_admin_user(user):
+        return jsonify({"error": "Forbidden"}), 403
 
-    booking_list.sort(key=lambda b: (b["date"], b["start_time"]))
-    safety_alerts.sort(key=lambda a: (a["date"], a["expected_arrival_time"]))
-    return jsonify({"status": "success", "bookings": booking_list, "safety_alerts": safety_alerts})
+    subscriber, replay, reset = admin_events.subscribe(request.headers.get("Last-Event-ID"))
+    if subscriber is None:
+        metrics.observe_shed("event_streams")
+        response = jsonify({"error": "Too many open event streams on this server. Please retry shortly."})
+        response.headers["Retry-After"] = str(SSE_RETRY_AFTER_SECONDS)
+        return response, 503
+    response = Response(
+        stream_with_context(stream_admin_events(subscriber, replay, reset)), mimetype="text/event-stream"
+    )
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
 
 
 @app.route("/api/mark-arrived", methods=["POST"])
+@idempotent
 def mark_arrived():
     user = verify_token(request)
     if not user:
@@ -698,7 +2526,10 @@ def mark_arrived():
     if (booking.get("status") or "").lower() == "rejected":
         return jsonify({"error": "Arrival cannot be marked for rejected bookings."}), 400
 
-    doc_ref.update({"has_arrived": True, "arrival_marked_at": firestore.SERVER_TIMESTAMP})
+    run_concurrently(
+        lambda: doc_ref.update({"has_arrived": True, "arrival_marked_at": firestore.SERVER_TIMESTAMP}),
+        lambda: overdue_scheduler.cancel(f"booking_{booking_id}", resolve=True),
+    )
     return jsonify({"status": "success", "message": "Arrival marked successfully"})
 
 
@@ -718,20 +2549,167 @@ def update_booking_status(new_status):
     if not booking_id:
         return jsonify({"error": "Missing required field: id"}), 400
 
-    db.collection("bookings").document(booking_id).update({"status": new_status})
+    if not set_booking_status(db.transaction(), db.collection("bookings").document(booking_id), new_status):
+        return jsonify({"status": "conflict", "message": "Room already booked"}), 400
+    if new_status == "Rejected":
+        overdue_scheduler.cancel(f"booking_{booking_id}", resolve=True)
     return jsonify({"status": "success", "message": f"Booking {new_status.lower()}"})
 
 
 @app.route("/api/approve", methods=["POST"])
+@idempotent
 def approve_booking():
     return update_booking_status("Approved")
 
 
 @app.route("/api/reject", methods=["POST"])
+@idempotent
 def reject_booking():
     return update_booking_status("Rejected")
 
 
+BULK_MAX_IDS = 1000
+FIRESTORE_BATCH_LIMIT = 500
+
+
+def parse_bulk_ids(data):
+    ids = data.get("ids")
+    if not isinstance(ids, list) or not ids:
+        return None, (jsonify({"error": "Missing required field: ids"}), 400)
+    if len(ids) > BULK_MAX_IDS:
+        return None, (jsonify({"error": f"At most {BULK_MAX_IDS} ids per request."}), 400)
+    if not all(isinstance(item, str) and item and "/" not in item for item in ids):
+        return None, (jsonify({"error": "ids must be non-empty document ids."}), 400)
+    return list(dict.fromkeys(ids)), None
+
+
+def commit_in_chunks(operations):
+    # Each operation is (method, ref, *args) on a WriteBatch; batches are capped
+    # at Firestore's per-commit write limit.
+    for start in range(0, len(operations), FIRESTORE_BATCH_LIMIT):
+        batch = db.batch()
+        for method, ref, *args in operations[start:start + FIRESTORE_BATCH_LIMIT]:
+            getattr(batch, method)(ref, *args)
+        batch.commit()
+
+
+def clear_resolved_alerts(alert_ids):
+    # The batch that resolved these already deleted their alert documents (the
+    # alert listener streams the clears), so only scheduler state is left.
+    for alert_id in alert_ids:
+        overdue_scheduler.discard(alert_id)
+
+
+def load_bookings(booking_ids):
+    refs = [db.collection("bookings").document(booking_id) for booking_id in booking_ids]
+    return {snapshot.id: snapshot for snapshot in db.get_all(refs)}
+
+
+def bulk_update_booking_status(new_status):
+    backend_error = ensure_backend_ready()
+    if backend_error:
+        return backend_error
+
+    user = verify_token(request)
+    if not user:
+        return jsonify({"error": "Unauthorized"}), 401
+    if not is_admin_user(user):
+        return jsonify({"error": "Forbidden"}), 403
+
+    booking_ids, ids_error = parse_bulk_ids(request.get_json(silent=True) or {})
+    if ids_error:
+        return ids_error
+
+    snapshots = load_bookings(booking_ids)
+    results = {}
+    operations = []
+    reinstated = []
+    for booking_id in booking_ids:
+        snapshot = snapshots.get(booking_id)
+        if snapshot is None or not snapshot.exists:
+            results[booking_id] = {"error": "Booking not found"}
+            continue
+        if not availability.blocks_slot(snapshot.to_dict() or {}) and availability.blocks_slot({"status": new_status}):
+            reinstated.append(snapshot.reference)
+            continue
+        operations.append(("update", snapshot.reference, {"status": new_status}))
+        if new_status == "Rejected":
+            operations.append(("delete", db.collection("alerts").document(f"booking_{booking_id}")))
+        results[booking_id] = {"status": "success"}
+
+    commit_in_chunks(operations)
+    # Rejected bookings take their slot back one transaction at a time, so each
+    # re-check sees the ones approved before it, in this request or another.
+    for doc_ref in reinstated:
+        if set_booking_status(db.transaction(), doc_ref, new_status):
+            results[doc_ref.id] = {"status": "success"}
+        else:
+            results[doc_ref.id] = {"error": "Room already booked"}
+    if new_status == "Rejected":
+        clear_resolved_alerts(f"booking_{booking_id}" for booking_id, result in results.items() if "status" in result)
+    return jsonify({"status": "success", "message": f"Bookings {new_status.lower()}", "results": results})
+
+
+@app.route("/api/bulk-approve", methods=["POST"])
+@scan_endpoint
+@idempotent
+def bulk_approve_bookings():
+    return bulk_update_booking_status("Approved")
+
+
+@app.route("/api/bulk-reject", methods=["POST"])
+@scan_endpoint
+@idempotent
+def bulk_reject_bookings():
+    return bulk_update_booking_status("Rejected")
+
+
+@app.route("/api/bulk-mark-arrived", methods=["POST"])
+@scan_endpoint
+@idempotent
+def bulk_mark_arrived():
+    backend_error = ensure_backend_ready()
+    if backend_error:
+        return backend_error
+
+    user = verify_token(request)
+    if not user:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    booking_ids, ids_error = parse_bulk_ids(request.get_json(silent=True) or {})
+    if ids_error:
+        return ids_error
+
+    snapshots = load_bookings(booking_ids)
+    user_email = user.get("email", "")
+    is_admin = is_admin_user(user)
+    results = {}
+    operations = []
+    for booking_id in booking_ids:
+        snapshot = snapshots.get(booking_id)
+        if snapshot is None or not snapshot.exists:
+            results[booking_id] = {"error": "Booking not found"}
+            continue
+
+        booking = snapshot.to_dict() or {}
+        if not (is_admin or booking.get("user", "") == user_email):
+            results[booking_id] = {"error": "Forbidden"}
+            continue
+        if (booking.get("status") or "").lower() == "rejected":
+            results[booking_id] = {"error": "Arrival cannot be marked for rejected bookings."}
+            continue
+
+        operations.append(
+            ("update", snapshot.reference, {"has_arrived": True, "arrival_marked_at": firestore.SERVER_TIMESTAMP})
+        )
+        operations.append(("delete", db.collection("alerts").document(f"booking_{booking_id}")))
+        results[booking_id] = {"status": "success"}
+
+    commit_in_chunks(operations)
+    clear_resolved_alerts(f"booking_{booking_id}" for booking_id, result in results.items() if "status" in result)
+    return jsonify({"status": "success", "message": "Arrivals marked", "results": results})
+
+
 @app.route("/api/me", methods=["GET"])
 def get_me():
     backend_error = ensure_backend_ready()
@@ -751,10 +2729,244 @@ def get_me():
     )
 
 
+def timestamp_key(value):
+    return value.timestamp() if isinstance(value, datetime) else 0
+
+
+def merge_duplicates(collection, key_fn, id_fn, merge_fn):
+    """Moves every document of a collection to its deterministic id.
+
+    Documents sharing a natural key are merged into one by merge_fn; returns
+    {new_id: (old_ids, merged_data)} for the groups that were rewritten.
+    """
+    groups = {}
+    for doc in db.collection(collection).stream():
+        data = doc.to_dict() or {}
+        groups.setdefault(key_fn(data), []).append((doc.id, data))
+
+    rewritten = {}
+    operations = []
+    for key, docs in groups.items():
+        new_id = id_fn(*key)
+        if len(docs) == 1 and docs[0][0] == new_id:
+            continue
+        # The most recently updated document wins; created_at is the earliest.
+        docs.sort(key=lambda item: timestamp_key(item[1].get("updated_at") or item[1].get("created_at")))
+        merged = merge_fn([data for _, data in docs])
+        created = [data["created_at"] for _, data in docs if isinstance(data.get("created_at"), datetime)]
+        if created:
+            merged["created_at"] = min(created, key=timestamp_key)
+        old_ids = [doc_id for doc_id, _ in docs if doc_id != new_id]
+        operations.append(("set", db.collection(collection).document(new_id), merged))
+        operations.extend(("delete", db.collection(collection).document(doc_id)) for doc_id in old_ids)
+        rewritten[new_id] = (old_ids, merged)
+    commit_in_chunks(operations)
+    return rewritten
+
+
+def merge_commute_etas(docs):
+    merged = dict(docs[-1])
+    arrived = [data for data in docs if data.get("has_arrived")]
+    merged["has_arrived"] = bool(arrived)
+    merged["arrival_marked_at"] = arrived[-1].get("arrival_marked_at") if arrived else None
+    return merged
+
+
+def migrate_to_deterministic_ids():
+    reviews = merge_duplicates(
+        "food_reviews",
+        lambda data: (data.get("week", ""), data.get("hostel", ""), data.get("user", "")),
+        food_review_id,
+        lambda docs: dict(docs[-1]),
+    )
+    commutes = merge_duplicates(
+        "commute_eta",
+        lambda data: (data.get("user", ""), data.get("date", "")),
+        commute_eta_id,
+        merge_commute_etas,
+    )
+
+    # Alerts are keyed by the commute entry id; the scheduler re-raises any
+    # that are still overdue under the new id.
+    commit_in_chunks(
+        [
+            ("delete", db.collection("alerts").document(f"commute_{old_id}"))
+            for old_ids, _ in commutes.values()
+            for old_id in old_ids
+        ]
+    )
+    weeks = sorted({data.get("week", "") for _, data in reviews.values()})
+    for week in weeks:
+        rebuild_food_review_aggregates(week)
+    if reviews and food_review_snapshot.exists():
+        food_review_snapshot.refresh(db, full=True)
+
+    return {
+        "food_reviews": {
+            "rewritten": len(reviews),
+            "removed": sum(len(old_ids) for old_ids, _ in reviews.values()),
+            "weeks_rebuilt": len(weeks),
+        },
+        "commute_eta": {
+            "rewritten": len(commutes),
+            "removed": sum(len(old_ids) for old_ids, _ in commutes.values()),
+        },
+    }
+
+
+@app.route("/api/admin/migrations/deterministic-ids", methods=["POST"])
+@scan_endpoint
+@idempotent
+def run_deterministic_id_migration():
+    backend_error = ensure_backend_ready()
+    if backend_error:
+        return backend_error
+
+    user = verify_token(request)
+    if not user:
+        return jsonify({"error": "Unauthorized"}), 401
+    if not is_admin_user(user):
+        return jsonify({"error": "Forbidden"}), 403
+
+    return jsonify({"status": "success", **migrate_to_deterministic_ids()})
+
+
+def run_archive():
+    """Moves bookings and commute entries older than the horizon into the archive."""
+    holder = f"{socket.gethostname()}:{os.getpid()}"
+    lease = db.collection(archive.LEASE_COLLECTION).document("lease")
+    if not archive.claim_lease(db.transaction(), lease, holder, ARCHIVE_LEASE_SECONDS):
+        return None
+    try:
+        cutoff = archive_cutoff()
+        return {
+            "cutoff": cutoff,
+            "bookings": archive.archive_collection(db, "bookings", cutoff, "booking"),
+            "commute_eta": archive.archive_collection(db, "commute_eta", cutoff, "commute"),
+        }
+    finally:
+        archive.release_lease(db, holder)
+
+
+def start_archiver():
+    def run():
+        # Spread workers out so they do not all contend for the lease at once.
+        time.sleep(random.uniform(60, 600))
+        while True:
+            try:
+                result = run_archive()
+                if result is not None:
+                    app.logger.info("Archived documents dated before %s: %s", result["cutoff"], result)
+            except Exception:
+                app.logger.warning("Could not archive old bookings and commute entries", exc_info=True)
+            time.sleep(ARCHIVE_INTERVAL_SECONDS)
+
+    thread = threading.Thread(target=run, name="archiver", daemon=True)
+    thread.start()
+    return thread
+
+
+@app.route("/api/admin/archive/run", methods=["POST"])
+@scan_endpoint
+@idempotent
+def run_archive_now():
+    backend_error = ensure_backend_ready()
+    if backend_error:
+        return backend_error
+
+    user = verify_token(request)
+    if not user:
+        return jsonify({"error": "Unauthorized"}), 401
+    if not is_admin_user(user):
+        return jsonify({"error": "Forbidden"}), 403
+    if ARCHIVE_HORIZON_DAYS <= 0:
+        return jsonify({"error": "Archiving is disabled (ARCHIVE_HORIZON_DAYS=0)."}), 400
+
+    result = run_archive()
+    if result is None:
+        return jsonify({"error": "An archive run is already in progress."}), 409
+    return jsonify({"status": "success", **result})
+
+
+@app.route("/api/admin/token-cache-stats", methods=["GET"])
+def get_token_cache_stats():
+    user = verify_token(request)
+    if not user:
+        return jsonify({"error": "Unauthorized"}), 401
+    if not is_admin_user(user):
+        return jsonify({"error": "Forbidden"}), 403
+
+    return jsonify({"status": "success", "token_cache": token_cache.stats()})
+
+
+@app.route("/metrics", methods=["GET"])
+@unmetered
+def get_metrics():
+    body, content_type = metrics.render_latest()
+    return Response(body, content_type=content_type)
+
+
+def start_worker(warm_up=WORKER_WARM_UP):
+    """Per-process startup: Firebase clients, listeners and background threads.
+
+    With warm_up the Firestore channel is opened and the token signing certs
+    are fetched before returning, so the first requests do not pay for them.
+    Returns the time spent in each phase, or None if this process has
+    already started.
+    """
+    global worker_pid, booking_watch, current_affairs_watch, current_affairs_search_watch
+    with worker_lock:
+        if worker_pid == os.getpid():
+            return None
+
+        timings = {}
+        started = time.perf_counter()
+
+        def mark(phase):
+            nonlocal started
+            now = time.perf_counter()
+            timings[phase] = now - started
+            started = now
+
+        firebase_backend.get()
+        mark("firebase_init")
+        if not firebase_backend.error:
+            # Resolving the project id may fall back to probing the metadata server.
+            project_configured = firebase_project_configured()
+            mark("project_lookup")
+            if warm_up:
+                try:
+                    current_affairs_version_ref().get()
+                except Exception:
+                    app.logger.warning("Could not warm up the Firestore channel", exc_info=True)
+                mark("firestore_channel")
+                if project_configured:
+                    try:
+                        refresh_signing_certs()
+                    except Exception:
+                        app.logger.warning("Could not prefetch Firebase token signing certs", exc_info=True)
+                    mark("signing_certs")
+
+            booking_watch = start_booking_listener()
+            start_overdue_scheduler()
+            current_affairs_watch = current_affairs_version_ref().on_snapshot(current_affairs_cache.on_snapshot)
+            current_affairs_search_watch = db.collection("current_affairs").on_snapshot(
+                current_affairs_index.on_snapshot
+            )
+            start_food_review_snapshot_refresher()
+            if ARCHIVE_HORIZON_DAYS > 0:
+                start_archiver()
+            if project_configured:
+                start_cert_refresher(refresh_now=not warm_up)
+            mark("listeners")
+
+        worker_pid = os.getpid()
+        metrics.observe_startup(timings)
+        return timings
+
+
 import os
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
     app.run(host="0.0.0.0", port=port)
-
-
@@ -0,0 +1,100 @@
+"""Month-partitioned archive for `bookings` and `commute_eta`.
+
+Documents dated before the archive horizon are moved, keeping their ids, into
+one collection per date month, `archive/<collection>_<YYYY-MM>/<collection>`,
+so the live collections (and every listing and listener over them) only hold
+recent activity. Partitions keep the live collection's id so the composite
+indexes in firestore.indexes.json apply to them as well. Each chunk is moved
+in one batched write: set into the archive, delete from the live collection
+and delete the document's alert. The months that have partitions are listed
+in `archive_partitions/<collection>`, which listings consult to query only
+the partitions a date range touches. Documents without a date are never
+archived.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import storage
+
+PARTITIONS_COLLECTION = "archive_partitions"
+LEASE_COLLECTION = "archive_runs"
+# Three writes per document keeps a chunk within Firestore's 500-write batches.
+CHUNK_DOCUMENTS = 150
+# Dates are YYYY-MM-DD strings; the lower bound skips undated documents.
+EARLIEST_DATE = "1900-01-01"
+
+
+def partition_name(collection, month):
+    return f"archive/{collection}_{month}/{collection}"
+
+
+def months_in_range(months, date_from="", date_to=""):
+    """The archived months overlapping [date_from, date_to]; open ends are unbounded."""
+    return [
+        month
+        for month in months
+        if (not date_from or month >= date_from[:7])
+        and (not date_to or month <= date_to[:7])
+    ]
+
+
+def archived_months(client, collection):
+    snapshot = client.collection(PARTITIONS_COLLECTION).document(collection).get()
+    if not snapshot.exists:
+        return []
+    return sorted((snapshot.to_dict() or {}).get("months", []))
+
+
+@storage.transactional
+def register_months(transaction, reference, months):
+    snapshot = reference.get(transaction=transaction)
+    known = set((snapshot.to_dict() or {}).get("months", [])) if snapshot.exists else set()
+    if months <= known:
+        return
+    transaction.set(reference, {"months": sorted(known | months), "updated_at": datetime.now(timezone.utc)})
+
+
+@storage.transactional
+def claim_lease(transaction, reference, holder, seconds):
+    """Lets one process at a time run the archive job, across workers and hosts."""
+    snapshot = reference.get(transaction=transaction)
+    now = datetime.now(timezone.utc)
+    data = (snapshot.to_dict() or {}) if snapshot.exists else {}
+    if data.get("holder") not in (None, holder) and data.get("expires_at") and data["expires_at"] > now:
+        return False
+    transaction.set(reference, {"holder": holder, "expires_at": now + timedelta(seconds=seconds)})
+    return True
+
+
+def release_lease(client, holder):
+    reference = client.collection(LEASE_COLLECTION).document("lease")
+    snapshot = reference.get()
+    if snapshot.exists and (snapshot.to_dict() or {}).get("holder") == holder:
+        reference.delete()
+
+
+def archive_collection(client, collection, cutoff, alert_prefix):
+    """Moves every document dated before cutoff; returns {month: count}."""
+    live = client.collection(collection)
+    registry = client.collection(PARTITIONS_COLLECTION).document(collection)
+    moved = {}
+    while True:
+        docs = list(
+            live.where("date", ">=", EARLIEST_DATE).where("date", "<", cutoff).limit(CHUNK_DOCUMENTS).stream()
+        )
+        if not docs:
+            return moved
+
+        batch = client.batch()
+        months = set()
+        for doc in docs:
+            data = doc.to_dict() or {}
+            month = data["date"][:7]
+            months.add(month)
+            moved[month] = moved.get(month, 0) + 1
+            batch.set(client.collection(partition_name(collection, month)).document(doc.id), data)
+            batch.delete(live.document(doc.id))
+            batch.delete(client.collection("alerts").document(f"{alert_prefix}_{doc.id}"))
+        # Registered first, so a listing never misses a partition that has rows.
+        register_months(client.transaction(), registry, months)
+        batch.commit()
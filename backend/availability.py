@@ -0,0 +1,137 @@
+"""Room availability as fixed-resolution slot grids.
+
+Every (room, date) is a row of SLOTS_PER_DAY counters, one per SLOT_MINUTES
+of the day, holding the number of bookings covering that slot. Counters
+rather than bits let overlapping bookings be added and removed independently.
+Queries turn the rows for a set of dates and rooms into one boolean
+(dates, rooms, slots) array, so window searches are single NumPy reductions
+across every room at once.
+"""
+
+import re
+import threading
+
+import numpy as np
+
+SLOT_MINUTES = 5
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+TIME_PATTERN = re.compile(r"^([01]\d|2[0-3]):([0-5]\d)$|^24:00$")
+
+
+def blocks_slot(booking):
+    """Whether a booking occupies its room; rejected bookings free the slot."""
+    return booking.get("status") != "Rejected"
+
+
+def time_to_slot(value, round_up=False):
+    """Maps "HH:MM" to a slot boundary; None if the value is not a valid time."""
+    if not isinstance(value, str) or not TIME_PATTERN.match(value):
+        return None
+    hours, minutes = value.split(":")
+    total = int(hours) * 60 + int(minutes)
+    if round_up:
+        return -(-total // SLOT_MINUTES)
+    return total // SLOT_MINUTES
+
+
+def slot_to_time(slot):
+    minutes = slot * SLOT_MINUTES
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class DayGrid:
+    def __init__(self):
+        self.rooms = {}
+        self.counts = np.zeros((8, SLOTS_PER_DAY), dtype=np.int16)
+
+    def row(self, room):
+        row = self.rooms.get(room)
+        if row is None:
+            row = len(self.rooms)
+            if row == len(self.counts):
+                grown = np.zeros((row * 2, SLOTS_PER_DAY), dtype=np.int16)
+                grown[:row] = self.counts
+                self.counts = grown
+            self.rooms[room] = row
+        return row
+
+
+class SlotIndex:
+    """Booking slot counters per (room, date); rejected bookings are never counted."""
+
+    def __init__(self):
+        self._days = {}
+        self._bookings = {}
+        self._lock = threading.Lock()
+
+    def _remove_locked(self, booking_id):
+        previous = self._bookings.pop(booking_id, None)
+        if previous is not None:
+            date, row, start, end = previous
+            self._days[date].counts[row, start:end] -= 1
+
+    def upsert(self, booking_id, data):
+        date = data.get("date", "")
+        start = time_to_slot(data.get("start_time"))
+        end = time_to_slot(data.get("end_time"), round_up=True)
+        counted = blocks_slot(data) and date and start is not None and end is not None and start < end
+        with self._lock:
+            self._remove_locked(booking_id)
+            if not counted:
+                return
+            day = self._days.get(date)
+            if day is None:
+                day = self._days[date] = DayGrid()
+            row = day.row(data.get("room", ""))
+            day.counts[row, start:end] += 1
+            self._bookings[booking_id] = (date, row, start, end)
+
+    def remove(self, booking_id):
+        with self._lock:
+            self._remove_locked(booking_id)
+
+    def on_snapshot(self, col_snapshot, changes, read_time):
+        for change in changes:
+            if change.type.name == "REMOVED":
+                self.remove(change.document.id)
+            else:
+                self.upsert(change.document.id, change.document.to_dict() or {})
+
+    def busy_grid(self, dates, rooms=None):
+        """Returns (rooms, busy) with busy shaped (len(dates), len(rooms), SLOTS_PER_DAY).
+
+        Without an explicit room list, every room with a booking on any of
+        the dates is included, sorted by name.
+        """
+        with self._lock:
+            days = [self._days.get(date) for date in dates]
+            if rooms is None:
+                rooms = sorted({room for day in days if day for room in day.rooms})
+            positions = {room: i for i, room in enumerate(rooms)}
+            busy = np.zeros((len(dates), len(rooms), SLOTS_PER_DAY), dtype=bool)
+            for i, day in enumerate(days):
+                if not day:
+                    continue
+                matched = [(positions[room], row) for room, row in day.rooms.items() if room in positions]
+                if matched:
+                    targets, rows = zip(*matched)
+                    busy[i, list(targets)] = day.counts[list(rows)] > 0
+        return rooms, busy
+
+
+def runs(mask):
+    """[(start_slot, end_slot), ...] per row of a 2-D boolean array, in one pass."""
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    starts = np.argwhere(edges == 1)
+    ends = np.argwhere(edges == -1)
+    result = [[] for _ in range(mask.shape[0])]
+    for (row, start), (_, end) in zip(starts, ends):
+        result[row].append((int(start), int(end)))
+    return result
+
+
+def free_in_window(busy, start_slot, end_slot):
+    """Boolean (dates, rooms): the room has no booking anywhere in the window."""
+    return ~busy[:, :, start_slot:end_slot].any(axis=2)
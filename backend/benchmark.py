@@ -0,0 +1,465 @@
+"""Endpoint benchmark and load test for the Flask API.
+
+Seeds synthetic bookings, commute entries, food reviews and current affairs
+into the local SQLite storage backend, stubs token verification, then drives
+every user-facing route twice: sequentially through the Flask test client
+(handler cost) and concurrently over HTTP from a thread pool (server
+throughput). Admin maintenance jobs, the admin event stream and /metrics are
+not measured. Write scenarios act on seeded documents. The create-booking
+scenario runs concurrent writers against a shared set of rooms and checks
+afterwards that no two accepted bookings overlap.
+
+Results are written as JSON so runs can be compared between commits:
+
+    python benchmark.py --scale 10k --output bench-10k.json
+    python benchmark.py --scale 10k --baseline bench-10k.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+ROOMS = [f"LH-{n:03d}" for n in range(1, 61)]
+HOSTELS = ["Aravali", "Nilgiri", "Shivalik", "Vindhya", "Himadri", "Satpura"]
+TRAVEL_MODES = ["bus", "metro", "walk", "cycle", "car"]
+CATEGORIES = ["academic", "cultural", "sports", "placements", "notice"]
+SEED_BATCH = 500
+ADMIN_EMAIL = "admin@bench.local"
+
+
+def student_email(n):
+    return f"student{n:05d}@bench.local"
+
+
+def iso_week(day):
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def time_label(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def seed(client, count, rng):
+    """Write `count` documents into each of the four collections."""
+    today = date.today()
+    users = max(count // 10, 1)
+
+    def chunks(rows):
+        batch = client.batch()
+        pending = 0
+        for collection, payload in rows:
+            batch.set(client.collection(collection).document(), payload)
+            pending += 1
+            if pending == SEED_BATCH:
+                batch.commit()
+                batch, pending = client.batch(), 0
+        if pending:
+            batch.commit()
+
+    def bookings():
+        for _ in range(count):
+            day = today + timedelta(days=rng.randint(-90, 30))
+            start = rng.randrange(8 * 60, 20 * 60, 30)
+            status = rng.choice(["Pending", "Approved", "Approved", "Rejected"])
+            yield "bookings", {
+                "room": rng.choice(ROOMS),
+                "date": day.isoformat(),
+                "start_time": time_label(start),
+                "end_time": time_label(start + 60),
+                "expected_arrival_time": time_label(start + 10),
+                "purpose": "Group study",
+                "user": student_email(rng.randrange(users)),
+                "status": status,
+                "has_arrived": day < today and rng.random() < 0.8,
+                "arrival_marked_at": None,
+            }
+
+    def commutes():
+        for _ in range(count):
+            day = today + timedelta(days=rng.randint(-90, 7))
+            yield "commute_eta", {
+                "user": student_email(rng.randrange(users)),
+                "date": day.isoformat(),
+                "expected_arrival_time": time_label(rng.randrange(7 * 60, 11 * 60, 5)),
+                "travel_mode": rng.choice(TRAVEL_MODES),
+                "notes": "",
+                "has_arrived": day < today and rng.random() < 0.9,
+                "arrival_marked_at": None,
+            }
+
+    def food_reviews():
+        for n in range(count):
+            day = today - timedelta(weeks=n % 16)
+            ratings = [rng.randint(1, 5) for _ in range(3)]
+            yield "food_reviews", {
+                "week": iso_week(day),
+                "hostel": rng.choice(HOSTELS),
+                "taste_rating": ratings[0],
+                "hygiene_rating": ratings[1],
+                "variety_rating": ratings[2],
+                "overall_rating": round(sum(ratings) / 3, 2),
+                "comment": "Decent food" if rng.random() < 0.3 else "",
+                "user": student_email(n),
+            }
+
+    def current_affairs():
+        for n in range(count):
+            day = today + timedelta(days=rng.randint(-180, 60))
+            yield "current_affairs", {
+                "title": f"Campus update {n}",
+                "content": "Details of the announcement. " * 8,
+                "category": rng.choice(CATEGORIES),
+                "event_date": day.isoformat(),
+                "created_by": ADMIN_EMAIL,
+            }
+
+    for rows in (bookings(), commutes(), food_reviews(), current_affairs()):
+        chunks(rows)
+
+
+def fake_verify_token(req):
+    # "Authorization: Bearer <email>" stands in for a verified Firebase token.
+    header = req.headers.get("Authorization", "")
+    if not header.startswith("Bearer "):
+        return None
+    email = header.split("Bearer ", 1)[1]
+    return {"email": email, "admin": email == ADMIN_EMAIL, "exp": time.time() + 3600}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(latencies, elapsed, statuses):
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "throughput_rps": round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+        "statuses": {str(code): statuses.count(code) for code in sorted(set(statuses))},
+    }
+
+
+def seeded_ids(client, collection, rng, keep=None):
+    ids = [
+        doc.id for doc in client.collection(collection).stream() if keep is None or keep(doc.to_dict() or {})
+    ]
+    rng.shuffle(ids)
+    return ids
+
+
+def build_scenarios(rng, client):
+    week = iso_week(date.today())
+    today = date.today()
+    bulk_size = 50
+
+    # Rejections get their own bookings so the arrival and approval scenarios
+    # keep acting on bookings that still hold their slot; deletions get their
+    # own current affairs so updates never hit a deleted one.
+    open_bookings = seeded_ids(client, "bookings", rng, lambda data: data.get("status") != "Rejected")
+    to_reject = open_bookings[: len(open_bookings) // 4]
+    to_update = open_bookings[len(open_bookings) // 4:]
+    commute_ids = seeded_ids(client, "commute_eta", rng)
+    affair_ids = seeded_ids(client, "current_affairs", rng)
+    to_edit = affair_ids[: len(affair_ids) // 2]
+    to_delete = affair_ids[len(affair_ids) // 2:]
+
+    def pick(ids):
+        return rng.choice(ids) if ids else "missing"
+
+    def sample(ids):
+        return rng.sample(ids, min(bulk_size, len(ids))) or ["missing"]
+
+    def booking_body():
+        start = rng.randrange(8 * 60, 20 * 60, 30)
+        return {
+            "room": rng.choice(ROOMS[:10]),
+            "date": (today + timedelta(days=rng.randint(1, 5))).isoformat(),
+            "start_time": time_label(start),
+            "end_time": time_label(start + 60),
+            "expected_arrival_time": time_label(start + 10),
+            "purpose": "Benchmark",
+        }
+
+    def review_body():
+        return {
+            "hostel": rng.choice(HOSTELS),
+            "week": week,
+            "taste_rating": rng.randint(1, 5),
+            "hygiene_rating": rng.randint(1, 5),
+            "variety_rating": rng.randint(1, 5),
+            "comment": "ok",
+        }
+
+    def commute_body():
+        return {
+            "date": (today + timedelta(days=rng.randint(0, 3))).isoformat(),
+            "expected_arrival_time": time_label(rng.randrange(7 * 60, 11 * 60, 5)),
+            "travel_mode": rng.choice(TRAVEL_MODES),
+        }
+
+    def affair_body():
+        return {
+            "title": f"Benchmark update {rng.randrange(10**6)}",
+            "content": "Details of the announcement. " * 8,
+            "category": rng.choice(CATEGORIES),
+            "event_date": (today + timedelta(days=rng.randint(0, 60))).isoformat(),
+        }
+
+    def delete_path():
+        return f"/api/admin/current-affairs/{to_delete.pop() if to_delete else 'missing'}"
+
+    def student():
+        return student_email(rng.randrange(100))
+
+    def admin():
+        return ADMIN_EMAIL
+
+    window = f"date_from={today.isoformat()}&date_to={(today + timedelta(days=6)).isoformat()}"
+    weeks = f"week_from={iso_week(today - timedelta(weeks=15))}&week_to={week}"
+    # (name, method, path or path factory, body factory, user factory)
+    return [
+        ("get_all_bookings", "GET", "/api/get-all-bookings", None, lambda: ADMIN_EMAIL),
+        ("get_all_bookings_page", "GET", "/api/get-all-bookings?limit=100", None, lambda: ADMIN_EMAIL),
+        ("get_admin_commute_alerts", "GET", "/api/get-admin-commute-alerts", None, lambda: ADMIN_EMAIL),
+        ("get_food_review_summary", "GET", f"/api/get-food-review-summary?week={week}", None, student),
+        ("get_current_affairs", "GET", "/api/current-affairs", None, student),
+        ("get_bookings", "GET", "/api/get-bookings", None, student),
+        ("get_commute_entries", "GET", "/api/get-commute-entries", None, student),
+        ("get_me", "GET", "/api/me", None, student),
+        ("room_availability", "GET", f"/api/room-availability?{window}&start_time=10:00&end_time=12:00", None, student),
+        ("food_review_trends", "GET", f"/api/food-review-trends?{weeks}", None, student),
+        ("search_current_affairs", "GET", "/api/current-affairs/search?q=campus+update&limit=20", None, student),
+        ("create_booking", "POST", "/api/create-booking", booking_body, student),
+        ("submit_food_review", "POST", "/api/submit-food-review", review_body, student),
+        ("submit_commute_eta", "POST", "/api/submit-commute-eta", commute_body, student),
+        ("mark_arrived", "POST", "/api/mark-arrived", lambda: {"id": pick(to_update)}, admin),
+        ("approve", "POST", "/api/approve", lambda: {"id": pick(to_update)}, admin),
+        ("reject", "POST", "/api/reject", lambda: {"id": pick(to_reject)}, admin),
+        ("bulk_approve", "POST", "/api/bulk-approve", lambda: {"ids": sample(to_update)}, admin),
+        ("bulk_reject", "POST", "/api/bulk-reject", lambda: {"ids": sample(to_reject)}, admin),
+        ("bulk_mark_arrived", "POST", "/api/bulk-mark-arrived", lambda: {"ids": sample(to_update)}, admin),
+        ("mark_commute_arrived", "POST", "/api/mark-commute-arrived", lambda: {"id": pick(commute_ids)}, admin),
+        ("create_current_affair", "POST", "/api/admin/current-affairs", affair_body, admin),
+        ("update_current_affair", "PUT", lambda: f"/api/admin/current-affairs/{pick(to_edit)}", affair_body, admin),
+        ("delete_current_affair", "DELETE", delete_path, None, admin),
+    ]
+
+
+def run_test_client(flask_app, scenarios, iterations):
+    client = flask_app.test_client()
+    results = {}
+    for name, method, path_fn, body_fn, user_fn in scenarios:
+        latencies, statuses = [], []
+        started = time.perf_counter()
+        for _ in range(iterations):
+            headers = {"Authorization": f"Bearer {user_fn()}"}
+            path = path_fn() if callable(path_fn) else path_fn
+            t0 = time.perf_counter()
+            response = client.open(path, method=method, headers=headers, json=body_fn() if body_fn else None)
+            response.get_data()
+            latencies.append(time.perf_counter() - t0)
+            statuses.append(response.status_code)
+        results[name] = summarize(latencies, time.perf_counter() - started, statuses)
+    return results
+
+
+def http_call(base_url, method, path, body, user):
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    request = urllib.request.Request(base_url + path, data=data, method=method)
+    request.add_header("Authorization", f"Bearer {user}")
+    if data is not None:
+        request.add_header("Content-Type", "application/json")
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as error:
+        error.read()
+        status = error.code
+    return time.perf_counter() - t0, status
+
+
+def run_http(base_url, scenarios, requests_per_route, concurrency):
+    results = {}
+    lock = threading.Lock()
+    for name, method, path_fn, body_fn, user_fn in scenarios:
+        latencies, statuses = [], []
+
+        def one(_):
+            with lock:
+                path = path_fn() if callable(path_fn) else path_fn
+                body = body_fn() if body_fn else None
+                user = user_fn()
+            elapsed, status = http_call(base_url, method, path, body, user)
+            with lock:
+                latencies.append(elapsed)
+                statuses.append(status)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one, range(requests_per_route)))
+        results[name] = summarize(latencies, time.perf_counter() - started, statuses)
+    return results
+
+
+def count_double_bookings(client):
+    # Seed rows are written without conflict checks, so only bookings created
+    # through the API during the run are held to the no-overlap invariant.
+    days = {}
+    for doc in client.collection("bookings").stream():
+        data = doc.to_dict() or {}
+        days.setdefault((data.get("room"), data.get("date")), []).append(
+            (data.get("start_time", ""), data.get("end_time", ""), data.get("purpose") == "Benchmark")
+        )
+    overlaps = 0
+    for intervals in days.values():
+        for i, (start, end, created) in enumerate(intervals):
+            if not created:
+                continue
+            for j, (other_start, other_end, other_created) in enumerate(intervals):
+                if i == j or (other_created and j < i):
+                    continue
+                if start < other_end and other_start < end:
+                    overlaps += 1
+    return overlaps
+
+
+def wait_until_settled(client, timeout=120):
+    # The overdue-alert scheduler fires every past-due seed row after start-up;
+    # wait for the alerts collection to stop growing before measuring.
+    deadline = time.time() + timeout
+    previous = -1
+    while time.time() < deadline:
+        current = sum(1 for _ in client.collection("alerts").select(["kind"]).stream())
+        if current == previous:
+            return current
+        previous = current
+        time.sleep(1.0)
+    return previous
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline):
+    lines = [f"{'mode':<12}{'route':<28}{'p95 base':>10}{'p95 now':>10}{'change':>9}"]
+    for mode in ("test_client", "http"):
+        for route, stats in current.get(mode, {}).items():
+            base = baseline.get(mode, {}).get(route)
+            if not base or not base.get("p95_ms"):
+                continue
+            change = (stats["p95_ms"] - base["p95_ms"]) / base["p95_ms"] * 100
+            lines.append(f"{mode:<12}{route:<28}{base['p95_ms']:>10.2f}{stats['p95_ms']:>10.2f}{change:>8.1f}%")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", default="1k", help="1k, 10k, 100k or a document count per collection")
+    parser.add_argument("--iterations", type=int, default=50, help="sequential test-client calls per route")
+    parser.add_argument("--http-requests", type=int, default=200, help="HTTP calls per route")
+    parser.add_argument("--concurrency", type=int, default=16, help="HTTP load generator threads")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="write JSON results to this file instead of stdout")
+    parser.add_argument("--baseline", help="previous JSON results to compare p95 latencies against")
+    args = parser.parse_args(argv)
+
+    count = SCALES.get(args.scale) or int(args.scale)
+    rng = random.Random(args.seed)
+    workdir = tempfile.mkdtemp(prefix="build-seed-bench-")
+    db_path = os.path.join(workdir, "bench.db")
+
+    import storage
+
+    seed_started = time.perf_counter()
+    seed_client = storage.SQLiteClient(db_path)
+    seed(seed_client, count, rng)
+    seed_client.close()
+    seed_seconds = time.perf_counter() - seed_started
+
+    os.environ["STORAGE_BACKEND"] = "sqlite"
+    os.environ["SQLITE_PATH"] = db_path
+    # The load test measures the handlers, not admission control.
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+    import app as app_module
+
+    app_module.verify_token = fake_verify_token
+    app_module.start_worker()
+    alerts = wait_until_settled(app_module.db)
+
+    scenarios = build_scenarios(rng, app_module.db)
+    test_client_results = run_test_client(app_module.app, scenarios, args.iterations)
+
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        http_results = run_http(f"http://127.0.0.1:{server.server_port}", scenarios, args.http_requests, args.concurrency)
+    finally:
+        server.shutdown()
+
+    results = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "scale": count,
+        "seed": args.seed,
+        "seed_seconds": round(seed_seconds, 2),
+        "seeded_alerts": alerts,
+        "iterations": args.iterations,
+        "http_requests": args.http_requests,
+        "concurrency": args.concurrency,
+        "double_bookings": count_double_bookings(app_module.db),
+        "test_client": test_client_results,
+        "http": http_results,
+    }
+
+    encoded = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        Path(args.output).write_text(encoded + "\n")
+    else:
+        print(encoded)
+
+    if args.baseline:
+        print(compare(results, json.loads(Path(args.baseline).read_text())), file=sys.stderr)
+    return 0 if results["double_bookings"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""Response compression negotiated from Accept-Encoding.
+
+Brotli is used when the client accepts it and the `brotli` package is
+installed; otherwise gzip. Bodies under COMPRESSION_MIN_BYTES, streamed
+responses and already-encoded responses are sent as they are.
+"""
+
+import gzip
+import os
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - gzip still works without it
+    brotli = None
+
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+# Bodies compressed once and cached can afford a slower, denser setting.
+CACHED_GZIP_LEVEL = 9
+CACHED_BROTLI_QUALITY = 9
+
+COMPRESSIBLE_MIMETYPES = ("application/json", "application/x-ndjson", "text/html", "text/plain")
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(req):
+    """Returns the preferred supported encoding for a request, or None."""
+    best, best_quality = None, 0
+    for encoding in SUPPORTED_ENCODINGS:
+        quality = req.accept_encodings[encoding]
+        # Ties go to the earlier entry, i.e. brotli over gzip.
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body, encoding, cached=False):
+    if encoding == "br":
+        return brotli.compress(body, quality=CACHED_BROTLI_QUALITY if cached else BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=CACHED_GZIP_LEVEL if cached else GZIP_LEVEL, mtime=0)
+
+
+def is_compressible(response):
+    return response.mimetype in COMPRESSIBLE_MIMETYPES
+
+
+def set_encoded_body(response, body, encoding):
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+
+
+def compress_response(response):
+    if not is_compressible(response):
+        return response
+    response.vary.add("Accept-Encoding")
+    if (
+        response.status_code < 200
+        or response.status_code in (204, 206, 304)
+        or response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+
+    encoding = negotiate(request)
+    if encoding is None:
+        return response
+    body = response.get_data()
+    if len(body) < COMPRESSION_MIN_BYTES:
+        return response
+    set_encoded_body(response, compress(body, encoding), encoding)
+    return response
+
+
+def init_app(app):
+    app.after_request(compress_response)
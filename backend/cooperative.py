@@ -0,0 +1,26 @@
+"""Cooperative (gevent) serving mode for the Flask app.
+
+Every view, the blocking Firestore client and token verification are run
+unchanged, but socket and gRPC waits yield to other greenlets instead of
+parking an OS thread, so a single worker can hold thousands of in-flight
+requests. Run with:
+
+    gunicorn --config gunicorn.conf.py -k gevent --worker-connections 2000 cooperative:app
+"""
+
+import os
+
+from gevent import monkey
+
+monkey.patch_all()
+
+import grpc.experimental.gevent as grpc_gevent  # noqa: E402
+
+# gRPC's C core must poll through gevent's hub, or every Firestore call would
+# block the whole worker.
+grpc_gevent.init_gevent()
+
+# Open event streams only park a greenlet here, not one of a few threads.
+os.environ.setdefault("SSE_MAX_SUBSCRIBERS", "1000")
+
+from app import app  # noqa: E402,F401
@@ -0,0 +1,51 @@
+"""gunicorn settings for the API (used by PROCFILE).
+
+The app is preloaded in the master, which is safe because importing it opens
+no Firebase or gRPC connections; each worker creates its own clients in
+post_worker_init and, unless WORKER_WARM_UP=0, opens the Firestore channel
+and fetches token signing certs before it accepts traffic.
+"""
+
+import glob
+import os
+import tempfile
+import time
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+preload_app = True
+accesslog = "-"
+
+# Workers share per-user rate-limit buckets through this file (see ratelimit.py).
+os.environ.setdefault(
+    "RATE_LIMIT_STATE_PATH", os.path.join(tempfile.gettempdir(), f"build-seed-ratelimit-{bind.rsplit(':', 1)[-1]}.db")
+)
+
+
+def on_starting(server):
+    # Samples left behind by a previous master would be merged into /metrics.
+    multiproc_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if multiproc_dir:
+        os.makedirs(multiproc_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(multiproc_dir, "*.db")):
+            os.remove(path)
+
+
+def post_worker_init(worker):
+    import app
+
+    started = time.perf_counter()
+    timings = app.start_worker()
+    if timings is not None:
+        phases = ", ".join(f"{phase} {seconds * 1000:.0f} ms" for phase, seconds in timings.items())
+        worker.log.info(
+            "Worker %s ready in %.0f ms (%s)", worker.pid, (time.perf_counter() - started) * 1000, phases
+        )
+
+
+def child_exit(server, worker):
+    import metrics
+
+    metrics.mark_process_dead(worker.pid)
@@ -0,0 +1,202 @@
+"""Idempotency-Key support for POST routes.
+
+A request retried with the same key, from the same user to the same route,
+gets the stored response of the first attempt instead of running the handler
+again. Keys are claimed in the `idempotency_keys` collection so every worker
+sees them, and finished responses are also kept in-process so most replays
+cost no round trip. A duplicate that arrives while the first attempt is still
+running waits for it rather than running in parallel.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta, timezone
+
+import storage
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+COLLECTION = "idempotency_keys"
+MAX_KEY_LENGTH = 255
+# Stored documents must stay well under Firestore's 1 MiB limit.
+MAX_STORED_BODY_BYTES = 256 * 1024
+# A claim this old whose response never arrived belongs to a dead worker.
+PENDING_TIMEOUT_SECONDS = 60
+POLL_SECONDS = 0.1
+
+logger = logging.getLogger(__name__)
+
+StoredResponse = namedtuple("StoredResponse", ["status", "body", "content_type"])
+
+
+class KeyReused(Exception):
+    """The key was already used for a request with a different body."""
+
+
+class StillRunning(Exception):
+    """The first request with this key did not finish in time."""
+
+
+def request_scope(user_email, method, path, key):
+    return hashlib.sha256("\x1f".join((user_email, method, path, key)).encode("utf-8")).hexdigest()
+
+
+def request_fingerprint(body):
+    return hashlib.sha256(body).hexdigest()
+
+
+def is_replayable(response):
+    # Server errors and rate limiting are worth retrying for real.
+    return (
+        response.status < 500
+        and response.status != 429
+        and len(response.body) <= MAX_STORED_BODY_BYTES
+    )
+
+
+@storage.transactional
+def claim_key(transaction, reference, fingerprint, ttl):
+    """Returns ("claimed", None), or the state and data of an existing claim."""
+    snapshot = reference.get(transaction=transaction)
+    now = datetime.now(timezone.utc)
+    data = (snapshot.to_dict() or {}) if snapshot.exists else None
+    if data and data.get("expires_at") and data["expires_at"] > now:
+        if data.get("fingerprint") != fingerprint:
+            return "mismatch", data
+        if data.get("state") == "done":
+            return "done", data
+        if data.get("claimed_at") and data["claimed_at"] > now - timedelta(seconds=PENDING_TIMEOUT_SECONDS):
+            return "pending", data
+    transaction.set(
+        reference,
+        {"state": "pending", "fingerprint": fingerprint, "claimed_at": now, "expires_at": now + ttl},
+    )
+    return "claimed", None
+
+
+class IdempotencyStore:
+    def __init__(self, client, ttl_seconds, wait_seconds, max_local_entries=10000):
+        self._client = client
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.wait_seconds = wait_seconds
+        self.max_local_entries = max_local_entries
+        self.replays = 0
+        self._local = OrderedDict()
+        self._running = {}
+        self._lock = threading.Lock()
+
+    def _reference(self, scope):
+        return self._client.collection(COLLECTION).document(scope)
+
+    def _local_get_locked(self, scope, fingerprint):
+        entry = self._local.get(scope)
+        if entry is None:
+            return None
+        expires_at, stored_fingerprint, stored = entry
+        if time.time() >= expires_at:
+            del self._local[scope]
+            return None
+        if stored_fingerprint != fingerprint:
+            raise KeyReused()
+        return stored
+
+    def _remember(self, scope, fingerprint, stored):
+        with self._lock:
+            self._local[scope] = (time.time() + self.ttl.total_seconds(), fingerprint, stored)
+            self._local.move_to_end(scope)
+            while len(self._local) > self.max_local_entries:
+                self._local.popitem(last=False)
+
+    def run(self, scope, fingerprint, handler):
+        """Runs handler() once per scope; returns (StoredResponse, replayed)."""
+        deadline = time.monotonic() + self.wait_seconds
+        while True:
+            with self._lock:
+                stored = self._local_get_locked(scope, fingerprint)
+                if stored is not None:
+                    self.replays += 1
+                    return stored, True
+                running = self._running.get(scope)
+                if running is None:
+                    event = threading.Event()
+                    self._running[scope] = (fingerprint, event)
+                    break
+            running_fingerprint, running_event = running
+            if running_fingerprint != fingerprint:
+                raise KeyReused()
+            if not running_event.wait(max(deadline - time.monotonic(), 0)):
+                raise StillRunning()
+
+        try:
+            stored = self._claim(scope, fingerprint, deadline)
+            if stored is not None:
+                self._remember(scope, fingerprint, stored)
+                with self._lock:
+                    self.replays += 1
+                return stored, True
+
+            try:
+                response = handler()
+            except Exception:
+                self._release(scope)
+                raise
+            if is_replayable(response):
+                self._remember(scope, fingerprint, response)
+                try:
+                    self._complete(scope, fingerprint, response)
+                except Exception:
+                    # Other workers treat the claim as abandoned once it goes stale.
+                    logger.warning("Could not store the response for an idempotency key", exc_info=True)
+            else:
+                self._release(scope)
+            return response, False
+        finally:
+            with self._lock:
+                self._running.pop(scope, None)
+            event.set()
+
+    def _claim(self, scope, fingerprint, deadline):
+        reference = self._reference(scope)
+        while True:
+            state, data = claim_key(self._client.transaction(), reference, fingerprint, self.ttl)
+            if state == "claimed":
+                return None
+            if state == "mismatch":
+                raise KeyReused()
+            if state == "done":
+                return StoredResponse(
+                    data.get("status", 200), data.get("body", "").encode("utf-8"), data.get("content_type")
+                )
+            # Another worker is running the first attempt.
+            if time.monotonic() >= deadline:
+                raise StillRunning()
+            time.sleep(POLL_SECONDS)
+
+    def _complete(self, scope, fingerprint, response):
+        now = datetime.now(timezone.utc)
+        try:
+            body = response.body.decode("utf-8")
+        except UnicodeDecodeError:
+            self._release(scope)
+            return
+        self._reference(scope).set(
+            {
+                "state": "done",
+                "fingerprint": fingerprint,
+                "status": response.status,
+                "body": body,
+                "content_type": response.content_type,
+                "claimed_at": now,
+                "expires_at": now + self.ttl,
+            }
+        )
+
+    def _release(self, scope):
+        self._reference(scope).delete()
+
+    def stats(self):
+        with self._lock:
+            return {"local_entries": len(self._local), "in_flight": len(self._running), "replays": self.replays}
@@ -0,0 +1,331 @@
+"""Prometheus instrumentation for the Flask app and its Firestore client.
+
+Set PROMETHEUS_MULTIPROC_DIR to an empty, writable directory before the
+workers start when running under gunicorn; every worker then writes its
+samples there and /metrics aggregates them (see gunicorn.conf.py).
+"""
+
+import os
+import threading
+import time
+
+from flask import g, has_request_context, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+import tracing
+
+BACKGROUND_ROUTE = "<background>"
+UNMATCHED_ROUTE = "<unmatched>"
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling a request, including streamed bodies.",
+    ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+REQUESTS = Counter(
+    "http_requests_total",
+    "Requests handled, by status code.",
+    ["method", "route", "status"],
+)
+FIRESTORE_QUERIES = Counter(
+    "firestore_queries_total",
+    "Firestore queries issued.",
+    ["route", "collection"],
+)
+FIRESTORE_DOCUMENTS = Counter(
+    "firestore_documents_streamed_total",
+    "Documents returned by Firestore queries.",
+    ["route", "collection"],
+)
+FIRESTORE_READS = Counter(
+    "firestore_document_reads_total",
+    "Document reads as Firestore bills them: query results (at least one per "
+    "query), point reads, get_all references and listener changes.",
+    ["route", "collection", "source"],
+)
+QUERIES_PER_REQUEST = Histogram(
+    "firestore_queries_per_request",
+    "Firestore queries issued while handling one request.",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 10, 25, 50, 100),
+)
+DOCUMENTS_PER_REQUEST = Histogram(
+    "firestore_documents_per_request",
+    "Documents streamed from Firestore while handling one request.",
+    ["route"],
+    buckets=(0, 1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 50000),
+)
+TOKEN_VERIFICATION = Histogram(
+    "token_verification_seconds",
+    "Time spent verifying Firebase ID tokens.",
+    ["cache"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1),
+)
+
+REQUESTS_SHED = Counter(
+    "http_requests_shed_total",
+    "Requests rejected by admission control before reaching the handler.",
+    ["route", "reason"],
+)
+
+WORKER_STARTUP = Histogram(
+    "worker_startup_seconds",
+    "Time spent in each phase of worker start-up.",
+    ["phase"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+
+class RequestUsage:
+    """Firestore usage for one request; shared by the request's I/O pool calls."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.documents = 0
+        self._lock = threading.Lock()
+
+    def add(self, queries=0, documents=0):
+        with self._lock:
+            self.queries += queries
+            self.documents += documents
+
+
+def current_route():
+    if not has_request_context():
+        return BACKGROUND_ROUTE
+    return request.url_rule.rule if request.url_rule else UNMATCHED_ROUTE
+
+
+def record_query(collection, documents, source="query", billed=None):
+    route = current_route()
+    FIRESTORE_QUERIES.labels(route, collection).inc()
+    if documents:
+        FIRESTORE_DOCUMENTS.labels(route, collection).inc(documents)
+    FIRESTORE_READS.labels(route, collection, source).inc(max(documents, 1) if billed is None else billed)
+    usage = g.get("metrics_usage") if has_request_context() else None
+    if usage is not None:
+        usage.add(queries=1, documents=documents)
+
+
+def record_listener_changes(collection, changes):
+    if changes:
+        FIRESTORE_READS.labels(current_route(), collection, "listener").inc(changes)
+
+
+def counted_listener(callback, collection):
+    def deliver(snapshots, changes, read_time):
+        record_listener_changes(collection, len(changes))
+        return callback(snapshots, changes, read_time)
+
+    return deliver
+
+
+def observe_token_verification(seconds, cached):
+    TOKEN_VERIFICATION.labels("hit" if cached else "miss").observe(seconds)
+
+
+def observe_shed(reason):
+    REQUESTS_SHED.labels(current_route(), reason).inc()
+
+
+def observe_startup(timings):
+    for phase, seconds in timings.items():
+        WORKER_STARTUP.labels(phase).observe(seconds)
+
+
+class InstrumentedQuery:
+    """Counts stream()/get() calls on a query; everything else passes through.
+
+    The builder calls that produced the query are kept as its shape, which the
+    tracer reports and uses to spot unfiltered, unbounded scans.
+    """
+
+    def __init__(self, query, collection, shape=()):
+        self._query = query
+        self._collection = collection
+        self._shape = shape
+
+    def __getattr__(self, name):
+        attr = getattr(self._query, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if name == "document":
+                return InstrumentedDocument(result, self._collection)
+            # Builder methods return new queries; listener handles have no
+            # stream() and are handed back untouched.
+            if hasattr(result, "stream"):
+                return InstrumentedQuery(result, self._collection, self._shape + ((name, args, tuple(kwargs.items())),))
+            return result
+
+        return call
+
+    def _begin(self, method):
+        route = current_route()
+        if route != BACKGROUND_ROUTE and tracing.is_full_scan(self._shape):
+            tracing.flag_full_scan(route, self._collection)
+        if not tracing.active():
+            return None
+        return tracing.leaf(
+            "firestore." + method, collection=self._collection, shape=tracing.describe_shape(self._shape)
+        )
+
+    def _end(self, span, count):
+        record_query(self._collection, count)
+        if span is not None:
+            span.duration = time.perf_counter() - span.start
+            span.set(documents=count)
+
+    def stream(self, *args, **kwargs):
+        span = self._begin("stream")
+        count = 0
+        try:
+            for snapshot in self._query.stream(*args, **kwargs):
+                count += 1
+                yield snapshot
+        finally:
+            self._end(span, count)
+
+    def get(self, *args, **kwargs):
+        span = self._begin("get")
+        snapshots = self._query.get(*args, **kwargs)
+        self._end(span, len(snapshots))
+        return snapshots
+
+    def on_snapshot(self, callback):
+        return self._query.on_snapshot(counted_listener(callback, self._collection))
+
+
+class InstrumentedDocument:
+    """Counts get() and listener deliveries on a document reference.
+
+    Everything else passes through, so batches, transactions and get_all
+    accept it wherever the client's own reference is expected.
+    """
+
+    def __init__(self, reference, collection):
+        self._reference = reference
+        self._collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self._reference, name)
+
+    def __eq__(self, other):
+        return self._reference == unwrap_reference(other)
+
+    def __hash__(self):
+        return hash(self._reference)
+
+    def get(self, *args, **kwargs):
+        span = tracing.leaf("firestore.get", collection=self._collection)
+        snapshot = self._reference.get(*args, **kwargs)
+        # A point read is billed whether or not the document exists.
+        record_query(self._collection, int(snapshot.exists), source="get", billed=1)
+        if span is not None:
+            span.duration = time.perf_counter() - span.start
+            span.set(documents=int(snapshot.exists))
+        return snapshot
+
+    def on_snapshot(self, callback):
+        return self._reference.on_snapshot(counted_listener(callback, self._collection))
+
+
+def unwrap_reference(reference):
+    return reference._reference if isinstance(reference, InstrumentedDocument) else reference
+
+
+class InstrumentedClient:
+    """Thin wrapper around the Firestore (or SQLite) client used by the app.
+
+    Only collection() and get_all() are intercepted. Batches and transactions
+    are the client's own objects; document references are thin proxies that
+    only count their own reads.
+    """
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def collection(self, name):
+        return InstrumentedQuery(self._client.collection(name), name)
+
+    def get_all(self, references, *args, **kwargs):
+        references = [unwrap_reference(reference) for reference in references]
+        collection = reference_collection(references[0]) if references else ""
+        span = tracing.leaf("firestore.get_all", collection=collection, requested=len(references))
+        count = 0
+        try:
+            for snapshot in self._client.get_all(references, *args, **kwargs):
+                count += 1
+                yield snapshot
+        finally:
+            if references:
+                record_query(collection, count, source="get_all", billed=len(references))
+            if span is not None:
+                span.duration = time.perf_counter() - span.start
+                span.set(documents=count)
+
+
+def reference_collection(reference):
+    collection = getattr(reference, "collection_name", None)
+    return collection if collection is not None else reference.parent.id
+
+
+def instrument_client(client):
+    return InstrumentedClient(client) if client is not None else None
+
+
+def before_request():
+    g.metrics_usage = RequestUsage()
+
+
+def after_request(response):
+    usage = g.get("metrics_usage")
+    if usage is None:
+        return response
+    method = request.method
+    route = current_route()
+
+    def observe():
+        # Runs when the body has been sent, so streamed responses are timed
+        # (and their Firestore reads counted) in full.
+        REQUEST_LATENCY.labels(method, route).observe(time.perf_counter() - usage.started)
+        REQUESTS.labels(method, route, str(response.status_code)).inc()
+        QUERIES_PER_REQUEST.labels(route).observe(usage.queries)
+        DOCUMENTS_PER_REQUEST.labels(route).observe(usage.documents)
+
+    response.call_on_close(observe)
+    return response
+
+
+def init_app(app):
+    app.before_request(before_request)
+    app.after_request(after_request)
+
+
+def render_latest():
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,129 @@
+"""Admission control: per-user token buckets and a per-worker concurrency cap.
+
+Each verified user has one bucket per budget ("scan" for endpoints that read
+whole collections, "default" for the rest), refilled continuously at the
+budget's rate up to its burst size. With RATE_LIMIT_STATE_PATH set, buckets
+live in a small SQLite file so every gunicorn worker on the host draws from
+the same budget; otherwise they are kept in-process.
+"""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+
+PRUNE_INTERVAL_SECONDS = 300
+# Buckets idle this long are full again and can be forgotten.
+IDLE_BUCKET_SECONDS = 3600
+
+
+class Budget:
+    def __init__(self, name, per_minute, burst):
+        self.name = name
+        self.rate = per_minute / 60.0
+        self.burst = max(burst, 1)
+
+
+def refill(tokens, updated, now, budget):
+    return min(budget.burst, tokens + (now - updated) * budget.rate)
+
+
+def retry_after(tokens, budget, cost=1):
+    return max(1, math.ceil((cost - tokens) / budget.rate)) if budget.rate > 0 else 60
+
+
+class MemoryBuckets:
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._pruned = time.time()
+
+    def take(self, key, budget, cost=1):
+        """Spends cost tokens; returns 0, or the seconds until they are available."""
+        now = time.time()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (budget.burst, now))
+            tokens = refill(tokens, updated, now, budget)
+            wait = 0 if tokens >= cost else retry_after(tokens, budget, cost)
+            if not wait:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            if now - self._pruned > PRUNE_INTERVAL_SECONDS:
+                self._pruned = now
+                for stale in [k for k, (_, seen) in self._buckets.items() if now - seen > IDLE_BUCKET_SECONDS]:
+                    del self._buckets[stale]
+        return wait
+
+
+class SQLiteBuckets:
+    """Buckets shared by every process that opens the same file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._pruned = time.time()
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        # The app is preloaded before gunicorn forks, and a SQLite connection
+        # must not be shared with a child process.
+        pid, connection = getattr(self._local, "connection", (None, None))
+        if pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            # Losing a few refills on power loss is fine; fsyncs per request are not.
+            connection.execute("PRAGMA synchronous=OFF")
+            self._local.connection = (os.getpid(), connection)
+        return connection
+
+    def take(self, key, budget, cost=1):
+        now = time.time()
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = refill(*row, now, budget) if row else budget.burst
+            wait = 0 if tokens >= cost else retry_after(tokens, budget, cost)
+            if not wait:
+                tokens -= cost
+            connection.execute(
+                "INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now),
+            )
+            if now - self._pruned > PRUNE_INTERVAL_SECONDS:
+                self._pruned = now
+                connection.execute("DELETE FROM buckets WHERE updated < ?", (now - IDLE_BUCKET_SECONDS,))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return wait
+
+
+class ConcurrencyLimit:
+    """Non-blocking cap on in-flight requests in this process."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            if self.in_flight >= self.limit:
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+def create_buckets(path):
+    return SQLiteBuckets(path) if path else MemoryBuckets()
@@ -0,0 +1,303 @@
+"""Columnar on-disk snapshot of `food_reviews` for multi-week trend queries.
+
+Each generation of the snapshot is a directory of NumPy files: int16 week
+and hostel codes (indexes into vocabularies kept in meta.json) and a (3, n)
+int8 array of taste/hygiene/variety ratings, plus the document ids in row
+order. Readers memory-map the current generation; a refresh writes a new
+generation next to it and swaps meta.json atomically, so readers never see a
+half-written snapshot.
+
+Refreshes are incremental: only reviews whose `updated_at` is at or after
+the stored watermark (less a small overlap for commit-time skew) are read,
+and a review that was resubmitted replaces its existing row.
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - no cross-process lock on Windows
+    fcntl = None
+
+RATING_FIELDS = ("taste_rating", "hygiene_rating", "variety_rating")
+RATING_NAMES = ("taste", "hygiene", "variety")
+SNAPSHOT_FIELDS = ["week", "hostel", "updated_at", *RATING_FIELDS]
+WATERMARK_OVERLAP = timedelta(seconds=60)
+META_FILE = "meta.json"
+LOCK_FILE = ".lock"
+
+
+class Columns:
+    """One snapshot generation: memory-mapped columns and their vocabularies."""
+
+    def __init__(self, directory, meta):
+        self.meta = meta
+        self.weeks = meta.get("weeks", [])
+        self.hostels = meta.get("hostels", [])
+        self.rows = meta.get("rows", 0)
+        generation = Path(directory) / meta["path"]
+        mmap_mode = "r" if self.rows else None
+        self.week = np.load(generation / "week.npy", mmap_mode=mmap_mode)
+        self.hostel = np.load(generation / "hostel.npy", mmap_mode=mmap_mode)
+        self.ratings = np.load(generation / "ratings.npy", mmap_mode=mmap_mode)
+
+
+class FoodReviewSnapshot:
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self._columns = None
+        self._meta_mtime = None
+        self._lock = threading.Lock()
+
+    def _read_meta(self):
+        try:
+            return json.loads((self.directory / META_FILE).read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def exists(self):
+        return (self.directory / META_FILE).exists()
+
+    def age_seconds(self):
+        meta = self._read_meta()
+        if not meta:
+            return None
+        return time.time() - meta.get("built_at", 0)
+
+    def load(self):
+        """The current generation, reloaded only when meta.json changes."""
+        try:
+            mtime = (self.directory / META_FILE).stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            if self._columns is None or self._meta_mtime != mtime:
+                meta = self._read_meta()
+                if meta is None:
+                    return self._columns
+                self._columns = Columns(self.directory, meta)
+                self._meta_mtime = mtime
+            return self._columns
+
+    def refresh(self, client, full=False, wait=True):
+        """Brings the snapshot up to date; returns stats, or None if another
+        process holds the lock and wait is False."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / LOCK_FILE, "a+") as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if wait else fcntl.LOCK_NB))
+                except BlockingIOError:
+                    return None
+            try:
+                return self._refresh_locked(client, full)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refresh_locked(self, client, full):
+        started = time.perf_counter()
+        meta = None if full else self._read_meta()
+        watermark = parse_watermark(meta.get("watermark")) if meta else None
+        reviews = client.collection("food_reviews").select(SNAPSHOT_FIELDS)
+
+        if meta is None or watermark is None:
+            weeks, hostels, ids = [], [], []
+            week_col = np.zeros(0, dtype=np.int16)
+            hostel_col = np.zeros(0, dtype=np.int16)
+            ratings = np.zeros((len(RATING_FIELDS), 0), dtype=np.int8)
+            docs = reviews.stream()
+            full = True
+        else:
+            current = Columns(self.directory, meta)
+            weeks, hostels = list(current.weeks), list(current.hostels)
+            ids = json.loads((self.directory / meta["path"] / "ids.json").read_text())
+            week_col = np.array(current.week, dtype=np.int16)
+            hostel_col = np.array(current.hostel, dtype=np.int16)
+            ratings = np.array(current.ratings, dtype=np.int8)
+            docs = reviews.where("updated_at", ">=", watermark - WATERMARK_OVERLAP).stream()
+
+        week_codes = {week: code for code, week in enumerate(weeks)}
+        hostel_codes = {hostel: code for code, hostel in enumerate(hostels)}
+        row_of = {doc_id: row for row, doc_id in enumerate(ids)}
+        updates = {}
+        appended = []
+        newest = watermark
+
+        for doc in docs:
+            data = doc.to_dict() or {}
+            week = data.get("week", "")
+            hostel = data.get("hostel", "Unknown Hostel")
+            if week not in week_codes:
+                week_codes[week] = len(weeks)
+                weeks.append(week)
+            if hostel not in hostel_codes:
+                hostel_codes[hostel] = len(hostels)
+                hostels.append(hostel)
+            values = (week_codes[week], hostel_codes[hostel], *(clamp_rating(data.get(f)) for f in RATING_FIELDS))
+            row = row_of.get(doc.id)
+            if row is None:
+                row_of[doc.id] = len(ids)
+                ids.append(doc.id)
+                appended.append(values)
+            else:
+                updates[row] = values
+            updated_at = data.get("updated_at")
+            if isinstance(updated_at, datetime) and (newest is None or updated_at > newest):
+                newest = updated_at
+
+        if len(weeks) > np.iinfo(np.int16).max or len(hostels) > np.iinfo(np.int16).max:
+            raise ValueError("too many distinct weeks or hostels for the snapshot codes")
+
+        if updates:
+            rows = np.fromiter(updates.keys(), dtype=np.int64, count=len(updates))
+            values = np.array(list(updates.values()), dtype=np.int16)
+            week_col[rows] = values[:, 0]
+            hostel_col[rows] = values[:, 1]
+            ratings[:, rows] = values[:, 2:].T
+        if appended:
+            values = np.array(appended, dtype=np.int16)
+            week_col = np.concatenate([week_col, values[:, 0]])
+            hostel_col = np.concatenate([hostel_col, values[:, 1]])
+            ratings = np.concatenate([ratings, values[:, 2:].T.astype(np.int8)], axis=1)
+
+        generation = (meta.get("generation", 0) if meta else self._last_generation()) + 1
+        path = f"gen-{generation}"
+        target = self.directory / path
+        if target.exists():
+            shutil.rmtree(target)
+        target.mkdir()
+        np.save(target / "week.npy", week_col)
+        np.save(target / "hostel.npy", hostel_col)
+        np.save(target / "ratings.npy", ratings)
+        (target / "ids.json").write_text(json.dumps(ids))
+
+        new_meta = {
+            "generation": generation,
+            "path": path,
+            "rows": len(ids),
+            "weeks": weeks,
+            "hostels": hostels,
+            "watermark": newest.astimezone(timezone.utc).isoformat() if newest else None,
+            "built_at": time.time(),
+        }
+        temp = self.directory / (META_FILE + ".tmp")
+        temp.write_text(json.dumps(new_meta))
+        os.replace(temp, self.directory / META_FILE)
+        # Readers holding a memory map of an older generation keep its pages.
+        for old in self.directory.glob("gen-*"):
+            if old.name != path:
+                shutil.rmtree(old, ignore_errors=True)
+
+        return {
+            "rows": len(ids),
+            "added": len(appended),
+            "updated": len(updates),
+            "full": full,
+            "watermark": new_meta["watermark"],
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+    def _last_generation(self):
+        generations = [int(path.name[4:]) for path in self.directory.glob("gen-*") if path.name[4:].isdigit()]
+        return max(generations, default=0)
+
+
+def parse_watermark(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def clamp_rating(value):
+    try:
+        rating = int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+    return rating if 1 <= rating <= 5 else 0
+
+
+def iso_week_range(week_from, week_to):
+    """Every ISO week from week_from to week_to inclusive, as YYYY-Www."""
+    first = datetime.strptime(week_from + "-1", "%G-W%V-%u")
+    last = datetime.strptime(week_to + "-1", "%G-W%V-%u")
+    # strptime rolls W53 of a 52-week year into the next year.
+    if first.strftime("%G-W%V") != week_from or last.strftime("%G-W%V") != week_to:
+        raise ValueError("not an ISO week")
+    weeks = []
+    current = first
+    while current <= last:
+        weeks.append(current.strftime("%G-W%V"))
+        current += timedelta(days=7)
+    return weeks
+
+
+def _rounded(row):
+    return [None if np.isnan(value) else round(float(value), 2) for value in row]
+
+
+def compute_trends(columns, weeks, hostels=None, window=4):
+    """Per-hostel weekly counts, means and trailing moving averages.
+
+    Moving averages pool the reviews of the last `window` weeks (so a week
+    with more reviews weighs more), computed from cumulative sums. Without an
+    explicit hostel list, every hostel with a review in the range is included.
+    """
+    week_positions = np.full(len(columns.weeks), -1, dtype=np.int64)
+    wanted_weeks = {week: position for position, week in enumerate(weeks)}
+    for code, week in enumerate(columns.weeks):
+        week_positions[code] = wanted_weeks.get(week, -1)
+
+    names = list(columns.hostels) if hostels is None else list(hostels)
+    hostel_positions = np.full(len(columns.hostels), -1, dtype=np.int64)
+    wanted_hostels = {hostel: position for position, hostel in enumerate(names)}
+    for code, hostel in enumerate(columns.hostels):
+        hostel_positions[code] = wanted_hostels.get(hostel, -1)
+
+    week_count, hostel_count = len(weeks), len(names)
+    if columns.rows:
+        week_pos = week_positions[columns.week]
+        hostel_pos = hostel_positions[columns.hostel]
+        mask = (week_pos >= 0) & (hostel_pos >= 0) & (np.asarray(columns.ratings) > 0).all(axis=0)
+        cells = hostel_pos[mask] * week_count + week_pos[mask]
+        ratings = np.asarray(columns.ratings)[:, mask]
+    else:
+        cells = np.zeros(0, dtype=np.int64)
+        ratings = np.zeros((len(RATING_FIELDS), 0), dtype=np.int8)
+
+    size = hostel_count * week_count
+    counts = np.bincount(cells, minlength=size).reshape(hostel_count, week_count)
+    sums = np.stack(
+        [np.bincount(cells, weights=ratings[i], minlength=size).reshape(hostel_count, week_count) for i in range(len(RATING_FIELDS))]
+    )
+    sums = np.concatenate([sums, sums.mean(axis=0, keepdims=True)])
+
+    positions = np.arange(week_count)
+    low = np.maximum(positions - window + 1, 0)
+    count_cumsum = np.concatenate([np.zeros((hostel_count, 1)), np.cumsum(counts, axis=1)], axis=1)
+    sum_cumsum = np.concatenate([np.zeros((len(sums), hostel_count, 1)), np.cumsum(sums, axis=2)], axis=2)
+    window_counts = count_cumsum[:, positions + 1] - count_cumsum[:, low]
+    window_sums = sum_cumsum[:, :, positions + 1] - sum_cumsum[:, :, low]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.where(counts > 0, sums / counts, np.nan)
+        moving = np.where(window_counts > 0, window_sums / window_counts, np.nan)
+
+    if hostels is None:
+        keep = counts.sum(axis=1) > 0
+    else:
+        keep = np.ones(hostel_count, dtype=bool)
+
+    result = []
+    for h in np.flatnonzero(keep):
+        entry = {"hostel": names[h], "counts": counts[h].tolist()}
+        for metric, name in enumerate(RATING_NAMES + ("overall",)):
+            entry[name] = {"mean": _rounded(means[metric, h]), "moving_average": _rounded(moving[metric, h])}
+        result.append(entry)
+    return result
@@ -0,0 +1,120 @@
+"""Declarative row schemas for the listing endpoints.
+
+A View lists the fields an endpoint returns. Compiling it produces a slotted
+row class, a `from_doc` function that reads only those fields from a
+snapshot, and the projection to pass to Firestore `select()` so documents
+come back without the fields the view never shows.
+
+    BOOKING_VIEW = View(
+        "BookingRow",
+        DocumentId("id"),
+        Value("room"),
+        Flag("has_arrived"),
+        Extra("safety_alert_message"),
+    )
+    query = query.select(BOOKING_VIEW.projection)
+    rows = [BOOKING_VIEW.from_doc(doc, safety_alert_message="") for doc in query.stream()]
+
+Rows are serialized by the app's JSON provider via `to_dict()`.
+"""
+
+import dataclasses
+
+
+class Row:
+    """Base of the row classes a View compiles.
+
+    Each compiled class replaces to_dict with a straight-line version of this.
+    """
+
+    __slots__ = ()
+
+    def to_dict(self):
+        return {field.name: getattr(self, field.name) for field in dataclasses.fields(self)}
+
+
+class DocumentId:
+    """The snapshot's document id."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def expression(self):
+        return "doc.id"
+
+
+class Value:
+    """A stored field, with a default when it is missing."""
+
+    def __init__(self, name, source=None, default=""):
+        self.name = name
+        self.source = source or name
+        self.default = default
+
+    def expression(self):
+        return "get(%r, %r)" % (self.source, self.default)
+
+
+class Flag(Value):
+    """A stored field coerced to bool; missing means False."""
+
+    def __init__(self, name, source=None):
+        super().__init__(name, source, default=None)
+
+    def expression(self):
+        return "bool(get(%r))" % self.source
+
+
+class Extra:
+    """A value the caller supplies, e.g. from the alerts collection."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def expression(self):
+        return self.name
+
+
+class View:
+    def __init__(self, name, *fields):
+        self.name = name
+        self.fields = fields
+        self.names = tuple(field.name for field in fields)
+        self.projection = [field.source for field in fields if isinstance(field, Value)]
+        self.row_class = self._compile_row_class()
+        self.from_doc = self._compile_from_doc()
+
+    def _compile_row_class(self):
+        row_class = dataclasses.make_dataclass(
+            self.name, self.names, bases=(Row,), slots=True, eq=False, repr=False
+        )
+        source = "def to_dict(self):\n    return {%s}\n" % ", ".join(
+            "%r: self.%s" % (name, name) for name in self.names
+        )
+        namespace = {}
+        exec(source, namespace)
+        row_class.to_dict = namespace["to_dict"]
+        return row_class
+
+    def _compile_from_doc(self):
+        # One straight-line function per view: no per-field dispatch while
+        # serializing a listing.
+        extras = [field.name for field in self.fields if isinstance(field, Extra)]
+        signature = ", ".join(["doc"] + ["%s=None" % name for name in extras])
+        source = (
+            "def from_doc(%s):\n"
+            "    data = doc.to_dict() or {}\n"
+            "    get = data.get\n"
+            "    return Row(%s)\n"
+        ) % (signature, ", ".join(field.expression() for field in self.fields))
+        namespace = {"Row": self.row_class}
+        exec(source, namespace)
+        from_doc = namespace["from_doc"]
+        from_doc.__qualname__ = "%s.from_doc" % self.name
+        return from_doc
+
+
+def json_default(obj):
+    if isinstance(obj, Row):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
@@ -0,0 +1,160 @@
+"""In-memory inverted index over current affairs.
+
+Every worker mirrors the `current_affairs` collection from a listener into
+postings keyed by term, a per-category id set and a date-sorted id list. A
+search intersects the postings of its terms (every term must match), ranks
+the matches with BM25 over title, category and content (weighted in that
+order), and filters by category and event date without touching Firestore.
+"""
+
+import bisect
+import math
+import re
+import threading
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has in is it its of on or that the this to was were will with".split()
+)
+FIELD_WEIGHTS = (("title", 3.0), ("category", 2.0), ("content", 1.0))
+ROW_FIELDS = ("title", "content", "category", "event_date", "created_by")
+# BM25 term-frequency saturation and length normalisation.
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(str(text or "").casefold()) if token not in STOPWORDS]
+
+
+class CurrentAffairsIndex:
+    def __init__(self):
+        self.ready = threading.Event()
+        self._rows = {}
+        self._lengths = {}
+        self._total_length = 0.0
+        self._postings = {}
+        self._terms = {}
+        self._categories = {}
+        self._by_date = []
+        self._lock = threading.Lock()
+
+    def _remove_locked(self, doc_id):
+        row = self._rows.pop(doc_id, None)
+        if row is None:
+            return
+        for term in self._terms.pop(doc_id):
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._lengths.pop(doc_id)
+        category = row["category"].casefold()
+        members = self._categories[category]
+        members.discard(doc_id)
+        if not members:
+            del self._categories[category]
+        position = bisect.bisect_left(self._by_date, (row["event_date"], doc_id))
+        del self._by_date[position]
+
+    def upsert(self, doc_id, data):
+        row = {"id": doc_id, **{field: str(data.get(field, "") or "") for field in ROW_FIELDS}}
+        frequencies = {}
+        length = 0.0
+        for field, weight in FIELD_WEIGHTS:
+            for token in tokenize(row[field]):
+                frequencies[token] = frequencies.get(token, 0.0) + weight
+                length += weight
+
+        with self._lock:
+            self._remove_locked(doc_id)
+            self._rows[doc_id] = row
+            self._terms[doc_id] = tuple(frequencies)
+            for term, frequency in frequencies.items():
+                self._postings.setdefault(term, {})[doc_id] = frequency
+            self._lengths[doc_id] = length
+            self._total_length += length
+            self._categories.setdefault(row["category"].casefold(), set()).add(doc_id)
+            bisect.insort(self._by_date, (row["event_date"], doc_id))
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._remove_locked(doc_id)
+
+    def on_snapshot(self, col_snapshot, changes, read_time):
+        for change in changes:
+            if change.type.name == "REMOVED":
+                self.remove(change.document.id)
+            else:
+                self.upsert(change.document.id, change.document.to_dict() or {})
+        self.ready.set()
+
+    def search(self, query="", category="", date_from="", date_to="", offset=0, limit=20):
+        """Returns (total, rows) for one page; rows carry a relevance "score".
+
+        With no query terms, matches are ordered by event date, newest first.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            if not terms:
+                return self._browse_locked(category, date_from, date_to, offset, limit)
+
+            postings = [self._postings.get(term) for term in terms]
+            if not all(postings):
+                return 0, []
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            for other in postings[1:]:
+                candidates.intersection_update(other)
+            if category:
+                candidates.intersection_update(self._categories.get(category.casefold(), ()))
+            if date_from or date_to:
+                candidates = {doc_id for doc_id in candidates if self._in_range(doc_id, date_from, date_to)}
+
+            count = len(self._rows)
+            average_length = self._total_length / count
+            scores = dict.fromkeys(candidates, 0.0)
+            for term in terms:
+                matches = self._postings[term]
+                idf = math.log(1 + (count - len(matches) + 0.5) / (len(matches) + 0.5))
+                for doc_id in candidates:
+                    frequency = matches[doc_id]
+                    norm = K1 * (1 - B + B * self._lengths[doc_id] / average_length)
+                    scores[doc_id] += idf * frequency * (K1 + 1) / (frequency + norm)
+            ranked = sorted(candidates, key=lambda doc_id: (self._rows[doc_id]["event_date"], doc_id), reverse=True)
+            # Stable, so equal scores stay newest first.
+            ranked.sort(key=scores.__getitem__, reverse=True)
+            rows = [{**self._rows[doc_id], "score": round(scores[doc_id], 4)} for doc_id in ranked[offset:offset + limit]]
+        return len(ranked), rows
+
+    def _in_range(self, doc_id, date_from, date_to):
+        event_date = self._rows[doc_id]["event_date"]
+        return (not date_from or event_date >= date_from) and (not date_to or event_date <= date_to)
+
+    def _browse_locked(self, category, date_from, date_to, offset, limit):
+        # Walks the date-sorted list from the newest end and stops once the
+        # page is full, so browsing costs the page size, not the archive size.
+        low = bisect.bisect_left(self._by_date, (date_from,)) if date_from else 0
+        high = bisect.bisect_right(self._by_date, (date_to, "\uffff")) if date_to else len(self._by_date)
+        if not category:
+            page = [doc_id for _, doc_id in reversed(self._by_date[max(high - offset - limit, low):max(high - offset, low)])]
+            return max(high - low, 0), [{**self._rows[doc_id], "score": None} for doc_id in page]
+
+        members = self._categories.get(category.casefold(), set())
+        if date_from or date_to:
+            total = sum(1 for doc_id in members if self._in_range(doc_id, date_from, date_to))
+        else:
+            total = len(members)
+        page = []
+        skipped = 0
+        for position in range(high - 1, low - 1, -1):
+            if len(page) == limit:
+                break
+            doc_id = self._by_date[position][1]
+            if doc_id not in members:
+                continue
+            if skipped < offset:
+                skipped += 1
+            else:
+                page.append(doc_id)
+        return total, [{**self._rows[doc_id], "score": None} for doc_id in page]
@@ -0,0 +1,614 @@
+"""Storage backends for the Flask app.
+
+The routes in app.py are written against the subset of the Firestore client
+API they actually use: collection/document references, where/order_by/limit/
+start_after/select queries, get/set/update/delete, get_all, batched writes,
+transactions and on_snapshot listeners. `firestore.client()` is one
+implementation of that surface; `SQLiteClient` below is the other, so the app
+can run, be load-tested and be profiled without a Firebase project.
+
+The SQLite backend keeps every collection in one `documents` table with the
+document body as JSON, plus expression indexes on the fields the routes filter
+and sort by. Listeners only observe writes made through the same process.
+"""
+
+import contextlib
+import functools
+import json
+import logging
+import queue
+import re
+import secrets
+import sqlite3
+import string
+import threading
+from datetime import datetime, timezone
+
+from firebase_admin import firestore
+from google.api_core.exceptions import NotFound
+from google.cloud.firestore_v1 import transforms
+
+logger = logging.getLogger(__name__)
+
+ASCENDING = "ASCENDING"
+DESCENDING = "DESCENDING"
+
+# (collection, fields) pairs mirroring the queries issued by app.py; each
+# becomes an expression index over json_extract of those fields.
+SQLITE_INDEXES = [
+    ("bookings", ("room", "date")),
+    ("bookings", ("user", "date", "start_time")),
+    ("bookings", ("date", "start_time")),
+    ("bookings", ("has_arrived",)),
+    ("commute_eta", ("user", "date")),
+    ("commute_eta", ("date", "expected_arrival_time")),
+    ("commute_eta", ("has_arrived",)),
+    ("food_reviews", ("week", "hostel", "user")),
+    ("food_review_aggregates", ("week",)),
+    ("alerts", ("kind", "user")),
+]
+
+_FIELD_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_ID_ALPHABET = string.ascii_letters + string.digits
+_TIMESTAMP_KEY = "__ts__"
+_OPERATORS = {"==": "=", "<": "<", "<=": "<=", ">": ">", ">=": ">=", "!=": "!="}
+
+
+def transactional(fn):
+    """Backend-neutral replacement for `firestore.transactional`."""
+    firestore_fn = firestore.transactional(fn)
+
+    @functools.wraps(fn)
+    def wrapper(transaction, *args, **kwargs):
+        if isinstance(transaction, SQLiteTransaction):
+            return transaction.run(fn, *args, **kwargs)
+        return firestore_fn(transaction, *args, **kwargs)
+
+    return wrapper
+
+
+def _check_field(field):
+    if field != "__name__" and not _FIELD_RE.match(field):
+        raise ValueError(f"Unsupported field path: {field!r}")
+    return field
+
+
+def _field_sql(field):
+    if field == "__name__":
+        return "id"
+    return f"json_extract(data, '$.{_check_field(field)}')"
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {_TIMESTAMP_KEY: value.astimezone(timezone.utc).isoformat()}
+    if isinstance(value, dict):
+        return {key: _encode_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode_value(item) for item in value]
+    return value
+
+
+def _decode_object(obj):
+    if len(obj) == 1 and _TIMESTAMP_KEY in obj:
+        return datetime.fromisoformat(obj[_TIMESTAMP_KEY])
+    return obj
+
+
+def _dumps(data):
+    return json.dumps(_encode_value(data), separators=(",", ":"))
+
+
+def _loads(raw):
+    return json.loads(raw, object_hook=_decode_object)
+
+
+def _sql_param(value):
+    # Mirrors how json_extract surfaces values: timestamps compare by their
+    # ISO text, nested objects by their JSON text.
+    if isinstance(value, datetime):
+        return value.astimezone(timezone.utc).isoformat()
+    if isinstance(value, (dict, list)):
+        return _dumps(value)
+    return value
+
+
+def _apply_transforms(current, data, merge):
+    result = dict(current or {}) if merge else {}
+    now = datetime.now(timezone.utc)
+    for key, value in data.items():
+        if value is transforms.DELETE_FIELD:
+            result.pop(key, None)
+        elif value is transforms.SERVER_TIMESTAMP:
+            result[key] = now
+        elif isinstance(value, transforms.Increment):
+            base = result.get(key) if merge else None
+            result[key] = (base if isinstance(base, (int, float)) else 0) + value.value
+        else:
+            result[key] = value
+    return result
+
+
+def _python_key(value):
+    if isinstance(value, datetime):
+        return (2, value.astimezone(timezone.utc).isoformat())
+    if isinstance(value, bool):
+        return (1, int(value))
+    if isinstance(value, (int, float)):
+        return (1, value)
+    return (2, value) if isinstance(value, str) else (3, json.dumps(_encode_value(value), sort_keys=True))
+
+
+def _compare(left, op, right):
+    a, b = _python_key(left), _python_key(right)
+    if op == "==":
+        return a == b
+    if op == "!=":
+        return a != b
+    if a[0] != b[0]:
+        return False
+    return {"<": a < b, "<=": a <= b, ">": a > b, ">=": a >= b}[op]
+
+
+class DocumentSnapshot:
+    def __init__(self, reference, data, read_time=None):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self.read_time = read_time
+        self._data = data
+
+    def to_dict(self):
+        return None if self._data is None else dict(self._data)
+
+    def get(self, field):
+        if self._data is None or field not in self._data:
+            raise KeyError(field)
+        return self._data[field]
+
+
+class _Change:
+    class _Type:
+        def __init__(self, name):
+            self.name = name
+
+    def __init__(self, type_name, document):
+        self.type = self._Type(type_name)
+        self.document = document
+
+
+class _Watch:
+    def __init__(self, client, matcher, callback, single_document=None):
+        self._client = client
+        self._matcher = matcher
+        self._callback = callback
+        self._single_document = single_document
+        self._ids = set()
+
+    def unsubscribe(self):
+        self._client._remove_watch(self)
+
+    def initial(self, snapshots):
+        self._ids = {snapshot.id for snapshot in snapshots}
+        if self._single_document is not None:
+            snapshot = snapshots[0] if snapshots else DocumentSnapshot(self._single_document, None)
+            return [snapshot], [_Change("ADDED", snapshot)] if snapshot.exists else []
+        return snapshots, [_Change("ADDED", snapshot) for snapshot in snapshots]
+
+    def diff(self, reference, data):
+        matches = data is not None and self._matcher(reference, data)
+        snapshot = DocumentSnapshot(reference, data if matches else None)
+        if matches:
+            kind = "MODIFIED" if reference.id in self._ids else "ADDED"
+            self._ids.add(reference.id)
+        elif reference.id in self._ids:
+            self._ids.discard(reference.id)
+            kind = "REMOVED"
+            snapshot = DocumentSnapshot(reference, data)
+        else:
+            return None
+        if self._single_document is not None:
+            return [DocumentSnapshot(reference, data if matches else None)], [_Change(kind, snapshot)]
+        return [], [_Change(kind, snapshot)]
+
+    def deliver(self, snapshots, changes):
+        self._callback(snapshots, changes, datetime.now(timezone.utc))
+
+
+class Query:
+    def __init__(self, client, collection, filters=(), orders=(), limit=None, cursor=None, projection=None):
+        self._client = client
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._cursor = cursor
+        self._projection = projection
+
+    def _copy(self, **changes):
+        state = {
+            "filters": self._filters,
+            "orders": self._orders,
+            "limit": self._limit,
+            "cursor": self._cursor,
+            "projection": self._projection,
+        }
+        state.update(changes)
+        return Query(self._client, self._collection, **state)
+
+    def where(self, field, op, value):
+        if op != "in" and op not in _OPERATORS:
+            raise ValueError(f"Unsupported operator: {op!r}")
+        return self._copy(filters=self._filters + ((_check_field(field), op, value),))
+
+    def order_by(self, field, direction=ASCENDING):
+        if direction not in (ASCENDING, DESCENDING):
+            raise ValueError(f"Unsupported direction: {direction!r}")
+        return self._copy(orders=self._orders + ((_check_field(field), direction),))
+
+    def limit(self, count):
+        return self._copy(limit=int(count))
+
+    def start_after(self, values):
+        if not self._orders:
+            raise ValueError("start_after requires order_by")
+        if isinstance(values, DocumentSnapshot):
+            values = {**(values.to_dict() or {}), "__name__": values.id}
+        keys = [field for field, _ in self._orders]
+        missing = [key for key in keys[: len(values)] if key not in values]
+        if missing:
+            raise ValueError(f"Cursor is missing order_by fields: {missing}")
+        return self._copy(cursor=[values[key] for key in keys[: len(values)]])
+
+    def select(self, field_paths):
+        return self._copy(projection=tuple(_check_field(field) for field in field_paths))
+
+    def _sql(self):
+        clauses = ["collection = ?"]
+        params = [self._collection]
+        for field, op, value in self._filters:
+            expr = _field_sql(field)
+            if op == "in":
+                values = list(value)
+                clauses.append(f"{expr} IN ({', '.join('?' for _ in values)})" if values else "0")
+                params.extend(_sql_param(item) for item in values)
+            else:
+                if isinstance(value, datetime):
+                    # Stored timestamps are {"__ts__": iso} objects; compare the ISO text.
+                    expr = f"json_extract(data, '$.{_check_field(field)}.{_TIMESTAMP_KEY}')"
+                clauses.append(f"{expr} {_OPERATORS[op]} ?")
+                params.append(_sql_param(value))
+
+        for field, _ in self._orders:
+            if field != "__name__":
+                clauses.append(f"{_field_sql(field)} IS NOT NULL")
+
+        if self._cursor:
+            # Lexicographic "after" over the ordering, honouring each direction.
+            alternatives = []
+            for i, value in enumerate(self._cursor):
+                parts = []
+                for field, _ in self._orders[:i]:
+                    parts.append(f"{_field_sql(field)} = ?")
+                field, direction = self._orders[i]
+                parts.append(f"{_field_sql(field)} {'>' if direction == ASCENDING else '<'} ?")
+                alternatives.append((parts, list(self._cursor[:i]) + [value]))
+            clauses.append("(" + " OR ".join("(" + " AND ".join(parts) + ")" for parts, _ in alternatives) + ")")
+            for _, values in alternatives:
+                params.extend(_sql_param(item) for item in values)
+
+        sql = "SELECT id, data FROM documents WHERE " + " AND ".join(clauses)
+        orders = [f"{_field_sql(field)} {'ASC' if d == ASCENDING else 'DESC'}" for field, d in self._orders]
+        if not any(field == "__name__" for field, _ in self._orders):
+            orders.append("id ASC")
+        sql += " ORDER BY " + ", ".join(orders)
+        if self._limit is not None:
+            sql += " LIMIT ?"
+            params.append(self._limit)
+        return sql, params
+
+    def _project(self, data):
+        if self._projection is None:
+            return data
+        return {field: data[field] for field in self._projection if field in data}
+
+    def stream(self, transaction=None):
+        sql, params = self._sql()
+        rows = self._client._fetchall(sql, params)
+        collection = self._client.collection(self._collection)
+        for doc_id, raw in rows:
+            yield DocumentSnapshot(collection.document(doc_id), self._project(_loads(raw)))
+
+    def get(self, transaction=None):
+        return list(self.stream(transaction=transaction))
+
+    def _matches(self, reference, data):
+        if reference.collection_name != self._collection:
+            return False
+        for field, op, value in self._filters:
+            current = reference.id if field == "__name__" else data.get(field)
+            if current is None:
+                return False
+            if op == "in":
+                if not any(_compare(current, "==", item) for item in value):
+                    return False
+            elif not _compare(current, op, value):
+                return False
+        return all(field == "__name__" or data.get(field) is not None for field, _ in self._orders)
+
+    def on_snapshot(self, callback):
+        return self._client._add_watch(_Watch(self._client, self._matches, callback), self)
+
+
+class CollectionReference(Query):
+    def __init__(self, client, name):
+        super().__init__(client, name)
+        self.id = name
+
+    def document(self, document_id=None):
+        if document_id is None:
+            document_id = "".join(secrets.choice(_ID_ALPHABET) for _ in range(20))
+        return DocumentReference(self._client, self._collection, document_id)
+
+
+class DocumentReference:
+    def __init__(self, client, collection_name, document_id):
+        if not document_id or "/" in document_id:
+            raise ValueError(f"Invalid document id: {document_id!r}")
+        self._client = client
+        self.collection_name = collection_name
+        self.id = document_id
+
+    @property
+    def path(self):
+        return f"{self.collection_name}/{self.id}"
+
+    def __eq__(self, other):
+        # Compared by path so the app's instrumented proxies match too.
+        return getattr(other, "path", None) == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+    def get(self, field_paths=None, transaction=None):
+        return DocumentSnapshot(self, self._client._read(self))
+
+    def set(self, document_data, merge=False):
+        batch = self._client.batch()
+        batch.set(self, document_data, merge=merge)
+        batch.commit()
+
+    def update(self, field_updates):
+        batch = self._client.batch()
+        batch.update(self, field_updates)
+        batch.commit()
+
+    def delete(self):
+        batch = self._client.batch()
+        batch.delete(self)
+        batch.commit()
+
+    def on_snapshot(self, callback):
+        def matcher(reference, data):
+            return reference == self
+
+        return self._client._add_watch(_Watch(self._client, matcher, callback, single_document=self), self)
+
+
+class WriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def set(self, reference, document_data, merge=False):
+        self._writes.append(("set", reference, document_data, merge))
+        return self
+
+    def update(self, reference, field_updates):
+        self._writes.append(("update", reference, field_updates, True))
+        return self
+
+    def delete(self, reference):
+        self._writes.append(("delete", reference, None, False))
+        return self
+
+    def commit(self):
+        writes, self._writes = self._writes, []
+        self._client._commit(writes)
+        return writes
+
+
+class SQLiteTransaction(WriteBatch):
+    """Runs a read-modify-write inside one IMMEDIATE SQLite transaction.
+
+    Taking the database write lock before the first read makes the check and
+    the buffered writes atomic across threads and processes alike.
+    """
+
+    def run(self, fn, *args, **kwargs):
+        client = self._client
+        with client._write_lock:
+            connection = client._connection()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self, *args, **kwargs)
+                writes, self._writes = self._writes, []
+                changed = client._apply_writes(connection, writes)
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        client._publish(changed)
+        return result
+
+
+class SQLiteClient:
+    """Local stand-in for `firestore.client()` backed by a single SQLite file."""
+
+    def __init__(self, path=":memory:"):
+        self.path = path
+        self._in_memory = path == ":memory:"
+        self._local = threading.local()
+        self._write_lock = threading.RLock()
+        self._watch_lock = threading.Lock()
+        self._watches = []
+        self._events = queue.Queue()
+        # An in-memory database only exists on its own connection, so that mode
+        # shares one connection and serialises access through the write lock.
+        self._shared = self._connect() if self._in_memory else None
+        self._ensure_schema()
+        threading.Thread(target=self._dispatch_events, name="sqlite-listeners", daemon=True).start()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, timeout=30)
+        if not self._in_memory:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _connection(self):
+        if self._shared is not None:
+            return self._shared
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+        return connection
+
+    def _guard(self):
+        return self._write_lock if self._in_memory else contextlib.nullcontext()
+
+    def _fetchall(self, sql, params=()):
+        with self._guard():
+            return self._connection().execute(sql, params).fetchall()
+
+    def _fetchone(self, sql, params=()):
+        with self._guard():
+            return self._connection().execute(sql, params).fetchone()
+
+    def _ensure_schema(self):
+        with self._guard():
+            connection = self._connection()
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "collection TEXT NOT NULL, id TEXT NOT NULL, data TEXT NOT NULL, "
+                "PRIMARY KEY (collection, id)) WITHOUT ROWID"
+            )
+            for collection, fields in SQLITE_INDEXES:
+                name = f"idx_{collection}_{'_'.join(fields)}"
+                columns = ", ".join(_field_sql(field) for field in fields)
+                connection.execute(f"CREATE INDEX IF NOT EXISTS {name} ON documents (collection, {columns})")
+
+    def collection(self, name):
+        return CollectionReference(self, name)
+
+    def batch(self):
+        return WriteBatch(self)
+
+    def transaction(self, **kwargs):
+        return SQLiteTransaction(self)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        for reference in references:
+            yield reference.get()
+
+    def close(self):
+        connection = self._shared or getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+        self._local.connection = None
+
+    def _read(self, reference):
+        row = self._fetchone(
+            "SELECT data FROM documents WHERE collection = ? AND id = ?", (reference.collection_name, reference.id)
+        )
+        return _loads(row[0]) if row else None
+
+    def _apply_writes(self, connection, writes):
+        changed = []
+        for op, reference, data, merge in writes:
+            key = (reference.collection_name, reference.id)
+            if op == "delete":
+                connection.execute("DELETE FROM documents WHERE collection = ? AND id = ?", key)
+                changed.append((reference, None))
+                continue
+
+            current = None
+            if merge:
+                row = connection.execute("SELECT data FROM documents WHERE collection = ? AND id = ?", key).fetchone()
+                current = _loads(row[0]) if row else None
+                if op == "update" and current is None:
+                    raise NotFound(f"No document to update: {reference.path}")
+            document = _apply_transforms(current, data, merge)
+            connection.execute(
+                "INSERT OR REPLACE INTO documents (collection, id, data) VALUES (?, ?, ?)",
+                key + (_dumps(document),),
+            )
+            changed.append((reference, document))
+        return changed
+
+    def _commit(self, writes):
+        with self._write_lock:
+            connection = self._connection()
+            # A plain write issued from inside a transaction joins it.
+            owns_transaction = not connection.in_transaction
+            if owns_transaction:
+                connection.execute("BEGIN IMMEDIATE")
+            try:
+                changed = self._apply_writes(connection, writes)
+                if owns_transaction:
+                    connection.execute("COMMIT")
+            except Exception:
+                if owns_transaction:
+                    connection.execute("ROLLBACK")
+                raise
+        self._publish(changed)
+
+    def _publish(self, changed):
+        if changed:
+            self._events.put(changed)
+
+    def _add_watch(self, watch, source):
+        # Registration and the initial snapshot happen under the write lock so
+        # no committed write can fall between them.
+        with self._write_lock:
+            if isinstance(source, DocumentReference):
+                snapshot = source.get()
+                initial = [snapshot] if snapshot.exists else []
+            else:
+                initial = list(source.stream())
+            with self._watch_lock:
+                self._watches.append(watch)
+            self._events.put((watch, watch.initial(initial)))
+        return watch
+
+    def _remove_watch(self, watch):
+        with self._watch_lock:
+            if watch in self._watches:
+                self._watches.remove(watch)
+
+    def _dispatch_events(self):
+        while True:
+            event = self._events.get()
+            if isinstance(event, tuple):
+                watch, (snapshots, changes) = event
+                self._safe_deliver(watch, snapshots, changes)
+                continue
+            with self._watch_lock:
+                watches = list(self._watches)
+            for watch in watches:
+                changes = []
+                snapshots = []
+                for reference, data in event:
+                    result = watch.diff(reference, data)
+                    if result:
+                        snapshots.extend(result[0])
+                        changes.extend(result[1])
+                if changes:
+                    self._safe_deliver(watch, snapshots, changes)
+
+    @staticmethod
+    def _safe_deliver(watch, snapshots, changes):
+        try:
+            watch.deliver(snapshots, changes)
+        except Exception:
+            logger.exception("Storage listener callback failed")
@@ -0,0 +1,240 @@
+"""Opt-in per-request tracing and slow-request profiling.
+
+A trace is a tree of timed spans (token verification, every Firestore query
+with its shape and document count, serialization). Tracing is enabled for
+every request with TRACE_REQUESTS=1, or per request by an admin sending
+`X-Debug-Trace: 1`. Traced requests slower than TRACE_PROFILE_THRESHOLD_MS
+have their cProfile stats and span tree written to TRACE_PROFILE_DIR.
+"""
+
+import contextvars
+import cProfile
+import json
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+if not logger.handlers:
+    # Traces are logged at INFO, below the default root level, so the tracer
+    # gets its own handler rather than depending on the server's log config.
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+TRACE_REQUESTS = os.getenv("TRACE_REQUESTS", "").strip().lower() in ("1", "true", "yes")
+TRACE_HEADER = "X-Debug-Trace"
+TRACE_PROFILE_THRESHOLD_MS = float(os.getenv("TRACE_PROFILE_THRESHOLD_MS", "500"))
+TRACE_PROFILE_DIR = Path(os.getenv("TRACE_PROFILE_DIR") or Path(__file__).with_name("profiles"))
+MAX_ARG_LENGTH = 80
+
+_current_trace = contextvars.ContextVar("trace", default=None)
+_current_span = contextvars.ContextVar("trace_span", default=None)
+
+_warned_scans = set()
+_warned_scans_lock = threading.Lock()
+
+
+class Span:
+    __slots__ = ("name", "attrs", "start", "duration", "children")
+
+    def __init__(self, name, attrs, start):
+        self.name = name
+        self.attrs = attrs
+        self.start = start
+        self.duration = None
+        self.children = []
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self, origin):
+        record = {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": None if self.duration is None else round(self.duration * 1000, 3),
+        }
+        if self.attrs:
+            record["attrs"] = self.attrs
+        if self.children:
+            record["children"] = [child.to_dict(origin) for child in self.children]
+        return record
+
+
+class _NullSpan:
+    def set(self, **attrs):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Trace:
+    def __init__(self, method, path):
+        self.root = Span("request", {"method": method, "path": path}, time.perf_counter())
+        self.timings = {}
+        self.warnings = []
+        self.profiler = None
+        self._lock = threading.Lock()
+
+    def add_child(self, parent, span):
+        with self._lock:
+            parent.children.append(span)
+
+    def add_timing(self, name, seconds):
+        with self._lock:
+            self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def warn(self, message):
+        with self._lock:
+            self.warnings.append(message)
+
+    def to_dict(self):
+        origin = self.root.start
+        record = self.root.to_dict(origin)
+        if self.timings:
+            record["timings_ms"] = {name: round(seconds * 1000, 3) for name, seconds in self.timings.items()}
+        if self.warnings:
+            record["warnings"] = self.warnings
+        return record
+
+
+class span:
+    """Context manager timing a child of the current span; no-op when not tracing."""
+
+    __slots__ = ("name", "attrs", "_span", "_token")
+
+    def __init__(self, name, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self._span = None
+        self._token = None
+
+    def __enter__(self):
+        trace = _current_trace.get()
+        if trace is None:
+            return NULL_SPAN
+        parent = _current_span.get() or trace.root
+        self._span = Span(self.name, self.attrs, time.perf_counter())
+        trace.add_child(parent, self._span)
+        self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._span is None:
+            return False
+        self._span.duration = time.perf_counter() - self._span.start
+        if exc_type is not None:
+            self._span.set(error=exc_type.__name__)
+        _current_span.reset(self._token)
+        return False
+
+
+def leaf(name, **attrs):
+    """Starts a span that is never a parent, e.g. for a lazily consumed stream.
+
+    The caller sets `duration` itself; returns None when not tracing.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return None
+    leaf_span = Span(name, attrs, time.perf_counter())
+    trace.add_child(_current_span.get() or trace.root, leaf_span)
+    return leaf_span
+
+
+def active():
+    return _current_trace.get() is not None
+
+
+def add_timing(name, seconds):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_timing(name, seconds)
+
+
+def format_arg(value):
+    text = repr(value)
+    return text if len(text) <= MAX_ARG_LENGTH else text[: MAX_ARG_LENGTH - 3] + "..."
+
+
+def describe_shape(shape):
+    return [
+        [method] + [format_arg(arg) for arg in args] + ["%s=%s" % (key, format_arg(value)) for key, value in kwargs]
+        for method, args, kwargs in shape
+    ]
+
+
+def is_full_scan(shape):
+    return not any(method in ("where", "limit", "limit_to_last") for method, _, _ in shape)
+
+
+def flag_full_scan(route, collection):
+    message = "Full scan of collection %r in route %s" % (collection, route)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.warn(message)
+    # Outside debug mode each (route, collection) pair is only reported once.
+    with _warned_scans_lock:
+        if (route, collection) in _warned_scans and trace is None:
+            return
+        _warned_scans.add((route, collection))
+    logger.warning(message)
+
+
+def start(method, path, profile=True):
+    trace = Trace(method, path)
+    if profile:
+        trace.profiler = cProfile.Profile()
+        try:
+            trace.profiler.enable()
+        except ValueError:
+            # Another profiler is already attached to this thread.
+            trace.profiler = None
+    _current_trace.set(trace)
+    _current_span.set(None)
+    return trace
+
+
+def reset():
+    # Worker threads are reused across requests, so state is cleared explicitly.
+    _current_trace.set(None)
+    _current_span.set(None)
+
+
+def discard():
+    trace = _current_trace.get()
+    if trace is not None and trace.profiler is not None:
+        trace.profiler.disable()
+    reset()
+
+
+def finish(trace, route, status_code):
+    if trace.profiler is not None:
+        trace.profiler.disable()
+    reset()
+    trace.root.duration = time.perf_counter() - trace.root.start
+    trace.root.set(route=route, status=status_code)
+    record = trace.to_dict()
+    elapsed_ms = trace.root.duration * 1000
+    if trace.profiler is not None and elapsed_ms >= TRACE_PROFILE_THRESHOLD_MS:
+        record["profile"] = dump_profile(trace, route, elapsed_ms, record)
+    logger.info("trace %s", json.dumps(record, separators=(",", ":"), default=str))
+    return record
+
+
+def dump_profile(trace, route, elapsed_ms, record):
+    TRACE_PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", route).strip("-") or "root"
+    stem = TRACE_PROFILE_DIR / ("%s_%s_%dms_%d" % (datetime.now().strftime("%Y%m%dT%H%M%S%f"), slug, elapsed_ms, os.getpid()))
+    profile_path = stem.with_suffix(".prof")
+    trace.profiler.dump_stats(str(profile_path))
+    stem.with_suffix(".json").write_text(json.dumps(record, indent=2, default=str))
+    logger.warning("Slow request %s took %.1f ms; profile written to %s", route, elapsed_ms, profile_path)
+    return str(profile_path)